@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+# ------------------------------------------------------------------------------
+# lzss_encode
+# ------------------------------------------------------------------------------
+def lzss_encode(data, window_bits=8, lookahead_bits=4, chain=32):
+    """ LZSS (heatshrink-style) encode bytes, return encoded bytes.
+
+        Encoded bits stream, MSB first, is sequence of tokens:
+            1, byte[8]                              - literal byte
+            0, offset-1[window_bits], len-1[lookahead_bits]
+                                                    - copy 'len' bytes from
+                                                      'offset' bytes back
+        last byte is padded by zero bits, too short for any token if
+        window_bits + lookahead_bits is not less than 8.
+        chain - maximum previous positions with the same two bytes
+        tried for each position, nearest first.
+    """
+    src = np.frombuffer(bytes(data), dtype=np.uint8)
+    data_len = len(src)
+
+    best_len, best_offset = _lzss_matches(src, 1 << window_bits, 1 << lookahead_bits, chain)
+
+    # greedy parse, match shorter than 2 bytes is not shorter than literals
+    lengths = best_len.tolist()
+    tokens_pos = []
+    tokens_len = []
+    pos = 0
+    while pos < data_len:
+        length = lengths[pos]
+        if length < 2:
+            length = 1
+        tokens_pos.append(pos)
+        tokens_len.append(length)
+        pos += length
+
+    tokens_pos = np.array(tokens_pos, dtype=np.int64)
+    tokens_len = np.array(tokens_len, dtype=np.int64)
+    literal = tokens_len == 1
+
+    # tokens codes and bits count
+    ref_bits = 1 + window_bits + lookahead_bits
+    codes = np.where(literal,
+                     0x100 | src[tokens_pos].astype(np.int64),
+                     ((best_offset[tokens_pos] - 1) << lookahead_bits) | (tokens_len - 1))
+    nbits = np.where(literal, 9, ref_bits)
+
+    return _pack_bits(codes, nbits)
+
+# ------------------------------------------------------------------------------
+# _lzss_matches
+# ------------------------------------------------------------------------------
+def _lzss_matches(src, window, max_len, chain):
+    """ longest match (not longer than max_len) and it offset for each
+        position, candidates are hash chains of positions with the same
+        two bytes, all positions of chain depth compared at once by 8
+        bytes words """
+    data_len = len(src)
+    best_len = np.zeros(data_len, dtype=np.int64)
+    best_offset = np.zeros(data_len, dtype=np.int64)
+    if data_len < 2:
+        return best_len, best_offset
+
+    # previous position with the same two bytes key, -1 - not exist
+    keys = src[:-1].astype(np.int64) | (src[1:].astype(np.int64) << 8)
+    order = np.argsort(keys, kind='stable')
+    same = keys[order[1:]] == keys[order[:-1]]
+    prev = np.full(data_len - 1, -1, dtype=np.int64)
+    prev[order[1:][same]] = order[:-1][same]
+
+    # little-endian 8 bytes word from each position, zeros after data end
+    words_count = -(-max_len // 8)
+    padded = np.zeros(data_len + 8 * words_count, dtype=np.uint8)
+    padded[:data_len] = src
+    words = np.ndarray((data_len + 8 * (words_count - 1) + 1,), dtype='<u8',
+                       buffer=padded, strides=(1,))
+
+    limit = np.minimum(data_len - np.arange(data_len), max_len)
+    pos = np.arange(data_len - 1)
+    cand = prev.copy()
+
+    for _ in range(chain):
+        ok = (cand >= 0) & (pos - cand <= window)
+        pos, cand = pos[ok], cand[ok]
+        if not len(pos):
+            break
+
+        # equal bytes count, trailing zero bytes of words xor
+        length = np.zeros(len(pos), dtype=np.int64)
+        done = np.zeros(len(pos), dtype=bool)
+        for i in range(words_count):
+            x = words[pos + 8 * i] ^ words[cand + 8 * i]
+            low = x & (~x + np.uint64(1))
+            zeros = np.where(x == 0, 64, np.log2(np.maximum(low, 1)).astype(np.int64))
+            length += np.where(done, 0, zeros // 8)
+            done |= x != 0
+        length = np.minimum(length, limit[pos])
+
+        better = length > best_len[pos]
+        best_len[pos[better]] = length[better]
+        best_offset[pos[better]] = (pos - cand)[better]
+
+        # positions with the longest possible match are done
+        more = best_len[pos] < limit[pos]
+        pos, cand = pos[more], prev[cand[more]]
+
+    return best_len, best_offset
+
+# ------------------------------------------------------------------------------
+# lzss_decode
+# ------------------------------------------------------------------------------
+def lzss_decode(data, window_bits=8, lookahead_bits=4):
+    """ LZSS decode bytes encoded by lzss_encode, return bytearray """
+    bits = np.unpackbits(np.frombuffer(bytes(data), dtype=np.uint8)).tolist()
+    bits_len = len(bits)
+    ref_bits = window_bits + lookahead_bits
+    out = bytearray()
+    index = 0
+
+    while index < bits_len:
+        tag = bits[index]
+        index += 1
+
+        if tag:
+            if index + 8 > bits_len:
+                break
+            out.append(_bits_value(bits, index, 8))
+            index += 8
+        else:
+            if index + ref_bits > bits_len:
+                break
+            offset = _bits_value(bits, index, window_bits) + 1
+            length = _bits_value(bits, index + window_bits, lookahead_bits) + 1
+            index += ref_bits
+
+            # copy may overlap output end, copy by offset parts
+            while length > 0:
+                part = out[-offset:len(out) - offset + min(length, offset)]
+                out.extend(part)
+                length -= len(part)
+
+    return out
+
+# ------------------------------------------------------------------------------
+# _bits_value
+# ------------------------------------------------------------------------------
+def _bits_value(bits, index, count):
+    """ value of 'count' bits from index, MSB first """
+    value = 0
+    for bit in bits[index:index + count]:
+        value = (value << 1) | bit
+    return value
+
+# ------------------------------------------------------------------------------
+# _pack_bits
+# ------------------------------------------------------------------------------
+def _pack_bits(codes, nbits):
+    """ pack codes with variable bits count to bytes, MSB first """
+    offsets = np.cumsum(nbits) - nbits
+    token = np.repeat(np.arange(len(codes)), nbits)
+    shift = nbits[token] - 1 - (np.arange(int(nbits.sum())) - offsets[token])
+    bits = ((codes[token] >> shift) & 1).astype(np.uint8)
+
+    return np.packbits(bits).tobytes()
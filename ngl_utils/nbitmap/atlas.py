@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPainter
+
+
+class NAtlas(object):
+    """ Sprite atlas, packs small images to one or few atlas images """
+
+    @staticmethod
+    def pack(sizes, width, height):
+        """ shelf packer, sizes - list of (width, height), images higher
+            first placed to first shelf with free space, new atlas started
+            when shelves reach atlas height.
+            Return list of (atlas index, x, y) in sizes order and list of
+            each atlas (width, height) """
+        order = sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0], i))
+        places = [None] * len(sizes)
+
+        # each atlas is list of shelves [y, shelf height, used width]
+        atlases = []
+
+        for i in order:
+            w, h = sizes[i]
+            placed = False
+
+            for index, shelves in enumerate(atlases):
+                for shelf in shelves:
+                    if shelf[1] >= h and shelf[2] + w <= width:
+                        places[i] = (index, shelf[2], shelf[0])
+                        shelf[2] += w
+                        placed = True
+                        break
+                if placed:
+                    break
+
+                # new shelf under last shelf
+                top = shelves[-1][0] + shelves[-1][1]
+                if top + h <= height:
+                    shelves.append([top, h, w])
+                    places[i] = (index, 0, top)
+                    placed = True
+                    break
+
+            if not placed:
+                atlases.append([[0, h, w]])
+                places[i] = (len(atlases) - 1, 0, 0)
+
+        # atlas size is used width and height
+        atlas_sizes = []
+        for shelves in atlases:
+            atlas_sizes.append((max(shelf[2] for shelf in shelves),
+                                shelves[-1][0] + shelves[-1][1]))
+
+        return places, atlas_sizes
+
+    @staticmethod
+    def build(images, width, height):
+        """ pack images to atlas images (transparent background), width
+            and height - maximum atlas size, wider or higher images get
+            own atlas. Return atlas QImages and (atlas index, x, y) for
+            each image """
+        sizes = [ (image.width(), image.height()) for image in images ]
+        places, atlas_sizes = NAtlas.pack(sizes,
+                                          max([width] + [w for w, _ in sizes]),
+                                          max([height] + [h for _, h in sizes]))
+
+        atlases = []
+        for w, h in atlas_sizes:
+            atlas = QImage(w, h, QImage.Format_ARGB32)
+            atlas.fill(Qt.transparent)
+            atlases.append(atlas)
+
+        painter = QPainter()
+        for image, (index, x, y) in zip(images, places):
+            painter.begin(atlases[index])
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            painter.drawImage(x, y, image)
+            painter.end()
+
+        return atlases, places
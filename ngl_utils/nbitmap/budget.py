@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import heapq
+import numpy as np
+from PyQt5.QtGui import QImage
+
+from ngl_utils.nbitmap.converter import NBitmapsConverter
+from ngl_utils.nbitmap.ncodecs import NBitmapCodecs
+from ngl_utils.nbitmap.palette import NPalette
+
+
+class NFlashBudget(object):
+    """ Flash budget optimizer, chooses codec and JPEG quality for each
+        bitmap with minimum total distortion (sum of squared errors) and
+        total data size not more than budget
+    """
+
+    # JPEG qualities tried for each bitmap
+    qualities = (10, 20, 30, 40, 50, 60, 70, 80, 90, 95)
+
+    # RGB888 channels masks of out formats, errors measured after masking
+    masks = { 'format8': (0xE0, 0xE0, 0xC0),
+              'format16': (0xF8, 0xFC, 0xF8) }
+
+    @staticmethod
+    def candidates(image, name, nformat, backcolor, optimal=False, band_rows=0,
+                   profile='flash', gamma=None, dither='none', pixel_order='le',
+                   qualities=None, codecs=None):
+        """ bitmap compress candidates, the smallest lossless codec and
+            JPEG for each quality (formats with image codecs), list of
+            dicts with codec, quality, bytes, sse, psnr and ssim,
+            codecs - tried codecs, None - codecs tried by AUTO """
+        lossless = None
+        lossy = []
+
+        for codec in codecs or NBitmapCodecs.codecs(auto=True):
+            if codec.from_image and NBitmapsConverter.reducedFormat(nformat, dither):
+                continue
+
+            codec_qualities = (100,) if codec.lossless else (qualities or NFlashBudget.qualities)
+            for quality in codec_qualities:
+                nbmp = NBitmapsConverter.convertQImage(image, name, nformat,
+                                                       (codec.name, quality), backcolor,
+                                                       optimal, band_rows, profile, gamma,
+                                                       1, dither, pixel_order)
+                candidate = { 'codec': codec.name,
+                              'quality': quality,
+                              'bytes': NFlashBudget.bitmapSize(nbmp),
+                              'sse': 0,
+                              'psnr': float('inf'),
+                              'ssim': 1.0 }
+
+                if codec.lossless:
+                    if lossless is None or candidate['bytes'] < lossless['bytes']:
+                        lossless = candidate
+                    continue
+
+                decoded = QImage.fromData(bytes(nbmp.data), codec.name)
+                source, out = NFlashBudget.channels(image, decoded, nformat, backcolor, gamma)
+                candidate['sse'] = NFlashBudget.sse(source, out)
+                candidate['psnr'] = NFlashBudget.psnr(candidate['sse'], source.size)
+                candidate['ssim'] = NFlashBudget.ssim(source, out)
+                lossy.append(candidate)
+
+        return [lossless] + lossy
+
+    @staticmethod
+    def bitmapSize(nbmp):
+        """ bitmap flash bytes, data, colors table and rows offsets """
+        return nbmp.data_len_in_bytes + len(nbmp.clut) * 2 + len(nbmp.rows_offsets or []) * 4
+
+    @staticmethod
+    def channels(source, decoded, nformat, backcolor, gamma=None):
+        """ source and decoded images RGB888 (height, width, 3) arrays,
+            alfa mixed with backcolor, masked to nformat channels bits """
+        arrays = []
+        for image in (source, decoded):
+            words = NBitmapsConverter.imagePixels(image, backcolor, 'format32', gamma)
+            rgb = NPalette.fromRGB888(words.ravel()).reshape(words.shape + (3,))
+            if nformat in NFlashBudget.masks:
+                rgb = rgb & np.array(NFlashBudget.masks[nformat], dtype=np.uint8)
+            arrays.append(rgb)
+        return arrays
+
+    @staticmethod
+    def sse(a, b):
+        """ sum of squared errors """
+        diff = a.astype(np.int64) - b.astype(np.int64)
+        return int((diff * diff).sum())
+
+    @staticmethod
+    def psnr(sse, count):
+        """ PSNR in dB for sum of squared errors of 'count' values """
+        if sse == 0:
+            return float('inf')
+        return 10.0 * np.log10(255.0 * 255.0 * count / sse)
+
+    @staticmethod
+    def ssim(a, b, window=8):
+        """ mean SSIM of luma, statistics of all window x window blocks by
+            integral images """
+        weights = np.array([0.299, 0.587, 0.114])
+        x = a @ weights
+        y = b @ weights
+        height, width = x.shape
+        window = min(window, height, width)
+
+        def blocks_mean(v):
+            integral = np.zeros((height + 1, width + 1))
+            integral[1:, 1:] = v.cumsum(axis=0).cumsum(axis=1)
+            return (integral[window:, window:] - integral[:-window, window:] -
+                    integral[window:, :-window] + integral[:-window, :-window]) / (window * window)
+
+        mx, my = blocks_mean(x), blocks_mean(y)
+        vx = blocks_mean(x * x) - mx * mx
+        vy = blocks_mean(y * y) - my * my
+        cxy = blocks_mean(x * y) - mx * my
+
+        c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+        ssim = ((2 * mx * my + c1) * (2 * cxy + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+        return float(ssim.mean())
+
+    @staticmethod
+    def allocate(candidates, budget):
+        """ choose candidate of each bitmap, Lagrangian greedy on lower
+            convex hull of (bytes, sse) of each bitmap, steps with the
+            largest sse reduction per byte first while total bytes fit
+            budget. Return chosen candidates indexes or None if the
+            smallest candidates not fit """
+        hulls = [ NFlashBudget._hull(c) for c in candidates ]
+        steps = [0] * len(hulls)
+        total = sum(c[h[0]]['bytes'] for c, h in zip(candidates, hulls))
+
+        if total > budget:
+            return None
+
+        def step(i):
+            c, h, s = candidates[i], hulls[i], steps[i]
+            extra = c[h[s + 1]]['bytes'] - c[h[s]]['bytes']
+            gain = c[h[s]]['sse'] - c[h[s + 1]]['sse']
+            return (-gain / float(extra), i, extra)
+
+        heap = [ step(i) for i in range(len(hulls)) if len(hulls[i]) > 1 ]
+        heapq.heapify(heap)
+
+        while heap:
+            _, i, extra = heapq.heappop(heap)
+            if total + extra > budget:
+                continue
+
+            total += extra
+            steps[i] += 1
+            if steps[i] + 1 < len(hulls[i]):
+                heapq.heappush(heap, step(i))
+
+        return [ h[s] for h, s in zip(hulls, steps) ]
+
+    @staticmethod
+    def _hull(candidates):
+        """ candidates indexes of lower convex hull, bytes increase and
+            sse decrease """
+        order = sorted(range(len(candidates)),
+                       key=lambda i: (candidates[i]['bytes'], candidates[i]['sse']))
+        hull = []
+
+        for i in order:
+            x, y = candidates[i]['bytes'], candidates[i]['sse']
+            if hull and y >= candidates[hull[-1]]['sse']:
+                continue
+
+            # previous point above line from point before it to this point
+            while len(hull) > 1:
+                x0, y0 = candidates[hull[-2]]['bytes'], candidates[hull[-2]]['sse']
+                x1, y1 = candidates[hull[-1]]['bytes'], candidates[hull[-1]]['sse']
+                if (y0 - y1) * (x - x1) > (y1 - y) * (x1 - x0):
+                    break
+                hull.pop()
+
+            hull.append(i)
+
+        return hull
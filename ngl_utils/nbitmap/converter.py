@@ -1,104 +1,603 @@
 #!/usr/bin/env python3
 
-import os
-from PyQt5.QtCore import Qt, QSize
-from PyQt5.QtGui import QImage, QColor, QPainter
+import numpy as np
+from array import array
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from PyQt5.QtCore import QRect
+from PyQt5.QtGui import QImage, QImageReader, QImageIOHandler
 
 from ngl_utils.ncodegenerator import NBitmapCodeGen
 from ngl_utils.nbitmap.nbitmap import NGL_Bitmap
 from ngl_utils.nplugins.widgets.ngl_colors import NGL_Colors
-from ngl_utils.rle import rlem_encode, rlem_decode
+from ngl_utils.nbitmap.ncodecs import NBitmapCodecs
+from ngl_utils.nbitmap.palette import NPalette
+from ngl_utils.nbitmap.dither import NDither
+from ngl_utils.rle import RLEM_TYPECODES, rlem_encode_bands, rlem_encode_stream
+from ngl_utils.messages import error
 
 
 class NBitmapsConverter(object):
     """docstring for NBitmapsConverter"""
 
+    # data word bits, color bits and C data type for each out format,
+    # format8 - RGB332, format16 - RGB565, format32 - RGB888,
+    # gray4 - 4 bits gray, mono - 1 bit, rows packed MSB first,
+    # indexedN - N bits colors indexes and 565_RGB colors table,
+    # indexed - minimum indexes bits for image colors count
+    formats = { 'format8':  (8, 8, 'uint8_t'),
+                'format16': (16, 16, 'uint16_t'),
+                'format32': (32, 24, 'uint32_t'),
+                'gray4':    (8, 4, 'uint8_t'),
+                'mono':     (8, 1, 'uint8_t'),
+                'indexed':  (8, None, 'uint8_t'),
+                'indexed1': (8, 1, 'uint8_t'),
+                'indexed2': (8, 2, 'uint8_t'),
+                'indexed4': (8, 4, 'uint8_t'),
+                'indexed8': (8, 8, 'uint8_t') }
+
+    # RGB channels bits of dithered color formats
+    channels = { 'format8': (3, 3, 2),
+                 'format16': (5, 6, 5) }
+
+    # pixels words byte orders, le - MCU order, be - SPI displays wire order
+    pixel_orders = ('le', 'be')
+
+    # minimum image pixels for AUTO codecs trials in processes pool
+    parallel_pixels = 0x4000
+
+    # AUTO cost model profiles, weights of flash data byte and estimated
+    # decode cycle, cost = bytes * byte weight + cycles * cycle weight,
+    # flash - minimum data size, fps - minimum decode time
+    profiles = { 'flash':    (1.0, 0.0),
+                 'balanced': (1.0, 1.0 / 16),
+                 'fps':      (1.0 / 64, 1.0) }
+
     @staticmethod
-    def convertQImage(image, name, nformat, compress, backcolor):
+    def convertQImage(image, name, nformat, compress, backcolor, optimal=False, band_rows=0,
+                      profile='flash', gamma=None, workers=None, dither='none',
+                      pixel_order='le'):
         compressType, _ = compress
 
         nbmp = NGL_Bitmap(name, image.width(), image.height(), compressType)
+        nbmp.data_word_size, nbmp.color_bit, nbmp.datatype = NBitmapsConverter.formats[nformat]
+
+        # indexed formats, packed colors indexes and colors table
+        pixels = None
+        if nformat.startswith('indexed'):
+            indexes, palette, nbmp.color_bit = NBitmapsConverter.indexedData(image,
+                                                                             nbmp.color_bit,
+                                                                             backcolor,
+                                                                             gamma)
+            pixels = array('B', NPalette.pack(indexes, nbmp.color_bit).tobytes())
+            nbmp.clut = NPalette.toRGB565(palette)
+
+        # gray, mono and dithered formats
+        elif NBitmapsConverter.reducedFormat(nformat, dither):
+            pixels = NBitmapsConverter.reducedPixels(image, nformat, backcolor, gamma, dither)
 
         # convert/compress data
-        nbmp.data, nbmp.compressed = NBitmapsConverter.compressData(image, compress, nformat, name, backcolor)
+        data, nbmp.compressed, nbmp.rows_offsets, nbmp.cost = NBitmapsConverter.compressData(
+            image, compress, nformat, name, backcolor, optimal, pixels, band_rows,
+            workers, profile, gamma, pixel_order)
+        nbmp.band_rows = band_rows if nbmp.rows_offsets else 0
 
-        # code len in words and bytes
+        # swapped pixels words, image codecs data not changed
+        codec = NBitmapCodecs.get(nbmp.compressed)
+        if NBitmapsConverter.swapped(nformat, pixel_order) and not codec.from_image:
+            nbmp.pixel_order = pixel_order
+
+        # codec data words width may differ from pixels words
+        data_width = NBitmapCodecs.get(nbmp.compressed).dataWidth(nbmp.data_word_size)
+        if data_width != nbmp.data_word_size:
+            nbmp.data_word_size = data_width
+            nbmp.datatype = 'uint%d_t' % data_width
+
+        # data words array, code len in words and bytes
+        nbmp.data = data
         nbmp.data_len_in_words = len(nbmp.data)
+        nbmp.data_len_in_bytes = nbmp.data_len_in_words * nbmp.data_word_size // 8
+
+        return nbmp
+
+    @staticmethod
+    def convertFrames(frames, delays, name, nformat, compress, backcolor, optimal=False,
+                      band_rows=0, profile='flash', gamma=None, workers=None, dither='none',
+                      pixel_order='le'):
+        """ convert animation frames (QImages of the same size) to keyframe
+            NGL_Bitmap (first frame) with frames table and NGL_Bitmaps of
+            changed rects, each frame rect is changed pixels of frame from
+            previous frame, frame 0 rect - from last to first frame (loop),
+            delays - each frame delay in ms.
+            Return list of keyframe and frames rects NGL_Bitmaps """
+        width, height = frames[0].width(), frames[0].height()
+        for frame in frames:
+            if (frame.width(), frame.height()) != (width, height):
+                error('Animation "%s" frames sizes are not equal :(' % name)
+
+        key = NBitmapsConverter.convertQImage(frames[0], name, nformat, compress, backcolor,
+                                              optimal, band_rows, profile, gamma, workers,
+                                              dither, pixel_order)
+        bitmaps = [key]
+
+        # frames compared as out colors, after alfa mixing
+        nformat_cmp = nformat if nformat in ('format8', 'format16') else 'format32'
+        pixels = [ NBitmapsConverter.imagePixels(frame, backcolor, nformat_cmp, gamma)
+                   for frame in frames ]
+
+        key.frames = []
+        for i in range(len(frames)):
+            changed = pixels[i] != pixels[i - 1]
+            if not changed.any():
+                key.frames.append((0, 0, delays[i], None))
+                continue
+
+            # changed rect, pixels rows are from bottom to top
+            rows = np.flatnonzero(changed.any(axis=1))
+            cols = np.flatnonzero(changed.any(axis=0))
+            x, y = int(cols[0]), height - 1 - int(rows[-1])
+            rect = QRect(x, y, int(cols[-1]) - x + 1, height - int(rows[0]) - y)
+
+            frame = NBitmapsConverter.convertQImage(frames[i].copy(rect), '%s_f%d' % (name, i),
+                                                    nformat, compress, backcolor, optimal,
+                                                    band_rows, profile, gamma, workers, dither,
+                                                    pixel_order)
+            key.frames.append((x, y, delays[i], frame.name))
+            bitmaps.append(frame)
+
+        return bitmaps
+
+    @staticmethod
+    def convertStream(path, name, nformat, compress, backcolor, out, strip_rows,
+                      optimal=False, band_rows=0, gamma=None, dither='none', pixel_order='le'):
+        """ convert image file by horizontal strips of 'strip_rows' rows,
+            from bottom to top strip, and write bitmap code to 'out' file
+            object while converting, NGL_Bitmap data is not kept.
+            Not compressed or RLE data only, other codecs need whole image
+            and compressed by RLE,
+            RLE stream is the same as for whole image, optimal used only
+            with rows bands. Indexed formats not available (palette of
+            whole image). Ordered dithering is the same as for whole image
+            if strip_rows is multiple of 8, fs errors not diffused between
+            strips. Return NGL_Bitmap without data and code """
+        if nformat.startswith('indexed'):
+            error('Bitmap format "%s" not available for stream converting :(' % nformat)
+
+        size = QImageReader(path).size()
+        compressType = 'None' if compress[0].upper() == 'NONE' else 'RLE'
+
+        nbmp = NGL_Bitmap(name, size.width(), size.height(), compressType)
+        nbmp.data_word_size, nbmp.color_bit, nbmp.datatype = NBitmapsConverter.formats[nformat]
+        width = nbmp.data_word_size
+
+        # rows bands are whole strips parts
+        if band_rows and compressType == 'RLE':
+            strip_rows = max(strip_rows // band_rows, 1) * band_rows
+            nbmp.band_rows = band_rows
+            nbmp.rows_offsets = []
+
+        strips = NBitmapsConverter.stripsPixels(path, nformat, backcolor, strip_rows,
+                                                gamma, dither)
+        if NBitmapsConverter.swapped(nformat, pixel_order):
+            nbmp.pixel_order = pixel_order
+            strips = (np.asarray(pixels).byteswap() for pixels in strips)
+
+        out.write(NBitmapCodeGen.streamHead(nbmp, strip_rows))
 
-        if nformat == 'format8' or nbmp.compressed == 'JPG':
-            nbmp.data_len_in_bytes = nbmp.data_len_in_words
-            nbmp.data_word_size = 8
-            nbmp.datatype = 'uint8_t'
-        elif nformat == 'format16':
-            nbmp.data_len_in_bytes = nbmp.data_len_in_words * 2
-            nbmp.data_word_size = 16
-            nbmp.datatype = 'uint16_t'
+        if nbmp.rows_offsets is not None:
+            # packed formats rows are byte aligned
+            row_words = size.width()
+            if nformat in ('gray4', 'mono'):
+                row_words = -(-size.width() * nbmp.color_bit // 8)
 
-        # generate data code
-        nbmp.code = NBitmapCodeGen.bitmap(nbmp)
+            words = 0
+            for pixels in strips:
+                data, offsets = rlem_encode_bands(pixels, band_rows * row_words, optimal, width)
+                nbmp.rows_offsets += [words + offset for offset in offsets]
+                words += NBitmapsConverter.writeWords(out, data, width, size.width())
+        elif compressType == 'RLE':
+            words = NBitmapsConverter.writeWords(out, rlem_encode_stream(strips, width),
+                                                 width, size.width())
+        else:
+            words = NBitmapsConverter.writeWords(out, (w for pixels in strips
+                                                       for w in pixels.tolist()),
+                                                 width, size.width())
+
+        nbmp.data_len_in_words = words
+        nbmp.data_len_in_bytes = words * width // 8
+
+        out.write(NBitmapCodeGen.streamTail(nbmp))
+
+        # code saved, nothing to save later
+        nbmp.saved = True
 
         return nbmp
 
     @staticmethod
-    def compressData(image, compress, nformat, name, backcolor):
-        """ compress data NONE, RLE, JPG, AUTO(minimum size) """
+    def stripsPixels(path, nformat, backcolor, strip_rows, gamma=None, dither='none'):
+        """ generator of image file strips pixels words arrays, from bottom
+            to top strip, strips read by image reader clip rect if image
+            format supports it, else image loaded once and strips copied """
+        reader = QImageReader(path)
+        size = reader.size()
+        image = None
+        if not reader.supportsOption(QImageIOHandler.ClipRect):
+            image = reader.read()
+
+        for bottom in range(size.height(), 0, -strip_rows):
+            rect = QRect(0, max(bottom - strip_rows, 0), size.width(),
+                         min(strip_rows, bottom))
+
+            if image is None:
+                reader = QImageReader(path)
+                reader.setClipRect(rect)
+                strip = reader.read()
+            else:
+                strip = image.copy(rect)
+
+            if strip.isNull():
+                error('Bitmap "%s" strip read failed :(' % path)
+
+            if NBitmapsConverter.reducedFormat(nformat, dither):
+                yield NBitmapsConverter.reducedPixels(strip, nformat, backcolor, gamma, dither)
+            else:
+                yield NBitmapsConverter.imagePixels(strip, backcolor, nformat, gamma).ravel()
+
+    @staticmethod
+    def writeWords(out, words, word_size, line_words):
+        """ write words iterable to 'out' as C array hex lines of
+            'line_words' words, by chunks of whole lines, return words
+            count """
+        words = iter(words)
+        chunk = max(NGL_Bitmap.chunk_words // line_words, 1) * line_words
+        count = 0
+
+        while True:
+            part = array(RLEM_TYPECODES[word_size], islice(words, chunk))
+            if not part:
+                return count
+            count += NGL_Bitmap.writeWords(out, part, word_size, line_words)
+
+    @staticmethod
+    def compressData(image, compress, nformat, name, backcolor, optimal=False, pixels=None,
+                     band_rows=0, workers=None, profile='flash', gamma=None,
+                     pixel_order='le'):
+        """ compress data with registered codec (None, RLE, JPG, LZSS) or
+            AUTO - codec with minimum cost of codecs tried by AUTO, AUTO+LZSS
+            - also LZSS (not tried by AUTO),
+            optimal - use optimal (minimum size) RLE blocks split,
+            pixels - ready data words (indexed formats), image codecs
+            not used,
+            band_rows - encode by 'band_rows' rows bands with rows
+            offsets table (codecs with bands support, RLE),
+            workers - AUTO trials processes count, None or 1 - trials in
+            this process, pool only for images of parallel_pixels or more,
+            profile - AUTO cost model profile, see profiles,
+            gamma - alfa mixing gamma, None - as QPainter,
+            pixel_order - pixels words byte order, 'le' - as MCU (little
+            endian), 'be' - big endian (SPI displays wire order).
+            Return data, compress type name, bands offsets or None and
+            chosen codec cost numbers dict """
         compressType, compressQuality = compress
-        data = []
+        width = NBitmapsConverter.formats[nformat][0]
 
-        if compressType == 'AUTO':
-            dataNone, nk = NBitmapsConverter.compressData(image, ('None', None), nformat, name, backcolor)
-            dataRLE, rk = NBitmapsConverter.compressData(image, ('RLE', None), nformat, name, backcolor)
-            dataJPG, jk = NBitmapsConverter.compressData(image, ('JPG', compressQuality), nformat, name, backcolor)
+        try:
+            codecs = NBitmapCodecs.select(compressType)
+        except KeyError:
+            error('Unknown bitmap compress "%s", available - %s, AUTO, AUTO+%s :(' % (
+                  compressType, ', '.join(NBitmapCodecs.names()),
+                  '+'.join(c.name for c in NBitmapCodecs.codecs() if not c.auto)))
 
-            min_len = 2**32
-            for key, dt in [(nk, dataNone), (rk, dataRLE), (jk, dataJPG)]:
-                if len(dt) < min_len:
-                    min_len = len(dt)
-                    data = dt
-                    compressType = key
+        if pixels is not None:
+            codecs = [codec for codec in codecs if not codec.from_image]
+            if not codecs:
+                error('Bitmap compress "%s" not available for "%s" format :(' % (
+                      compressType, nformat))
 
-        elif compressType == 'JPG':
-            #  crete temp path and save image as jpg
-            path = './tmp.jpg'
+        # source pixels words in compact array, not needed for image codecs
+        if pixels is None and not all(codec.from_image for codec in codecs):
+            pixels = array(RLEM_TYPECODES[width])
+            pixels.frombytes(NBitmapsConverter.imagePixels(image, backcolor, nformat,
+                                                           gamma).tobytes())
 
-            image.save(path, 'JPG', compressQuality)
+        # pixels words bytes in wire order, codecs encode swapped words
+        if pixels is not None and NBitmapsConverter.swapped(nformat, pixel_order):
+            pixels.byteswap()
 
-            # open file, read data
-            with open(path, 'rb') as f:
-                data = [byte for byte in f.read()]
+        band_words = 0
+        if band_rows and pixels is not None:
+            band_words = band_rows * (len(pixels) // image.height())
+        params = (width, compressQuality, optimal, band_words)
 
-            # delete temp file
-            os.remove(path)
+        # small images trials are faster than processes start
+        workers = min(workers or 1, len(codecs))
+        if image.width() * image.height() < NBitmapsConverter.parallel_pixels:
+            workers = 1
 
+        if workers > 1:
+            # trials in processes pool, workers return only data size,
+            # winner codec data encoded again here
+            state = NBitmapsConverter.imageState(image)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                sizes = list(pool.map(NBitmapsConverter._codecTrial,
+                                      [ (codec.name, state if codec.from_image else None,
+                                         pixels, params) for codec in codecs ]))
+
+            costs = [ NBitmapsConverter.codecCost(c, size, image, profile)
+                      for c, size in zip(codecs, sizes) ]
+            min_cost = min(costs, key=lambda c: c['cost'])
+            codec = codecs[costs.index(min_cost)]
+            data, offsets = NBitmapsConverter._encode(codec, image, pixels, *params)
         else:
-            r, g, b = NGL_Colors.getRGB(backcolor)
-            Qbackcolor = QColor(r, g, b)
-            # 1px image and painter for images with alfa
-            img = QImage(1,1, QImage.Format_ARGB32)
-            painter = QPainter()
+            # encode, keep codec data with minimum cost
+            min_cost = None
+            for c in codecs:
+                dt, ofs = NBitmapsConverter._encode(c, image, pixels, *params)
+                size = NBitmapsConverter._dataSize(c, dt, ofs, width)
+                cost = NBitmapsConverter.codecCost(c, size, image, profile)
+
+                if min_cost is None or cost['cost'] < min_cost['cost']:
+                    min_cost = cost
+                    codec, data, offsets = c, dt, ofs
 
-            for y in range(image.height()-1, -1, -1):
-                for x in range(image.width()):
-                    argb_pixel = image.pixel(x, y)
-                    alfa = (argb_pixel >> 24)
+        compressType = codec.name
 
-                    alfa = (argb_pixel >> 24) & 0xFF
-                    if alfa == 0xFF:
-                         pixelData = NGL_Colors.fromARGB(argb_pixel)
-                    else:
-                        color = QColor(argb_pixel)
-                        color.setAlpha(alfa)
-                        pixelData = NBitmapsConverter.mixColors(img, Qbackcolor, color, painter)
+        # lossless compressed data must decode back to source pixels
+        if codec.lossless and codec.decode(data, width) != pixels:
+            error('%s round-trip check failed for bitmap "%s" :(' % (codec.name, name))
 
-                    data.append(pixelData)
+        return (data, compressType, offsets, min_cost)
 
-            if compressType == 'RLE':
-                data = rlem_encode(data)
+    @staticmethod
+    def reducedFormat(nformat, dither='none'):
+        """ pixels prepared by reducedPixels or indexedData, formats
+            without image codecs (JPG) """
+        return (nformat.startswith('indexed') or nformat in ('gray4', 'mono') or
+                (dither not in (None, 'none') and nformat in NBitmapsConverter.channels))
 
-        return (data, compressType)
+    @staticmethod
+    def swapped(nformat, pixel_order):
+        """ pixels words bytes swapped for pixel_order, 8-bit words
+            (RGB332, gray, mono, indexed) never swapped """
+        if pixel_order not in NBitmapsConverter.pixel_orders:
+            error('Unknown pixel order "%s", available - %s :(' % (
+                  pixel_order, ', '.join(NBitmapsConverter.pixel_orders)))
+
+        return pixel_order == 'be' and NBitmapsConverter.formats[nformat][0] > 8
+
+    @staticmethod
+    def codecCost(codec, size, image, profile='flash'):
+        """ codec cost model numbers for encoded data size in bytes,
+            return dict with profile, bytes, decode cycles and cost """
+        try:
+            byte_weight, cycle_weight = NBitmapsConverter.profiles[profile]
+        except KeyError:
+            error('Unknown bitmap cost profile "%s", available - %s :(' % (
+                  profile, ', '.join(sorted(NBitmapsConverter.profiles))))
+
+        cycles = codec.decode_cycles * image.width() * image.height()
+
+        return { 'profile': profile,
+                 'codec': codec.name,
+                 'bytes': size,
+                 'cycles': cycles,
+                 'cost': size * byte_weight + cycles * cycle_weight }
+
+    @staticmethod
+    def _encode(codec, image, pixels, width, quality, optimal, band_words):
+        """ encode with codec, return data and bands offsets or None """
+        if band_words and codec.bands:
+            return codec.encodeBands(pixels, width, band_words, optimal)
+        return codec.encode(image, pixels, width, quality, optimal), None
+
+    @staticmethod
+    def _dataSize(codec, data, offsets, width):
+        """ encoded data size in bytes, offsets table is uint32_t words """
+        return len(data) * codec.dataWidth(width) // 8 + len(offsets or []) * 4
+
+    @staticmethod
+    def _codecTrial(args):
+        """ AUTO trial in pool process, return only encoded data size """
+        name, state, pixels, params = args
+        codec = NBitmapCodecs.get(name)
+        image = NBitmapsConverter.imageFromState(state) if state else None
+
+        data, offsets = NBitmapsConverter._encode(codec, image, pixels, *params)
+        return NBitmapsConverter._dataSize(codec, data, offsets, params[0])
+
+    @staticmethod
+    def imageState(image):
+        """ picklable image state, ARGB32 pixels bytes and size """
+        image = image.convertToFormat(QImage.Format_ARGB32)
+        bits = image.constBits()
+        bits.setsize(image.byteCount())
+        return (bytes(bits), image.width(), image.height(), image.bytesPerLine())
+
+    @staticmethod
+    def imageFromState(state):
+        """ QImage from imageState """
+        data, width, height, bytes_per_line = state
+        return QImage(data, width, height, bytes_per_line, QImage.Format_ARGB32).copy()
+
+    @staticmethod
+    def sourceWords(image, nformat, backcolor, gamma=None, dither='none', pixel_order='le'):
+        """ pixels words array encoded by codecs for nformat, the same as
+            convertQImage source words, return array and words width """
+        width = NBitmapsConverter.formats[nformat][0]
+
+        if nformat.startswith('indexed'):
+            indexes, _, bpp = NBitmapsConverter.indexedData(
+                image, NBitmapsConverter.formats[nformat][1], backcolor, gamma)
+            pixels = array('B', NPalette.pack(indexes, bpp).tobytes())
+        elif NBitmapsConverter.reducedFormat(nformat, dither):
+            pixels = NBitmapsConverter.reducedPixels(image, nformat, backcolor, gamma, dither)
+        else:
+            pixels = array(RLEM_TYPECODES[width])
+            pixels.frombytes(NBitmapsConverter.imagePixels(image, backcolor, nformat,
+                                                           gamma).tobytes())
+
+        if NBitmapsConverter.swapped(nformat, pixel_order):
+            pixels.byteswap()
+
+        return pixels, width
+
+    @staticmethod
+    def reducedPixels(image, nformat, backcolor, gamma=None, dither='none'):
+        """ gray4/mono packed rows bytes or RGB332/RGB565 words array,
+            quantized by dither method - none, ordered or fs """
+        width, height = image.width(), image.height()
+        words = NBitmapsConverter.imagePixels(image, backcolor, 'format32', gamma)
+        rgb = NPalette.fromRGB888(words.ravel()).reshape(height, width, 3)
+
+        if nformat in ('gray4', 'mono'):
+            bpp = NBitmapsConverter.formats[nformat][1]
+            gray = rgb @ np.array([0.299, 0.587, 0.114])
+            index = NDither.quantize(gray, 1 << bpp, dither)
+            return array('B', NPalette.pack(index, bpp).tobytes())
+
+        r, g, b = NBitmapsConverter.channels[nformat]
+        index = NDither.quantize(rgb, [1 << r, 1 << g, 1 << b], dither).astype(np.uint32)
+        words = (index[:, :, 0] << (g + b)) | (index[:, :, 1] << b) | index[:, :, 2]
+
+        pixels = array(RLEM_TYPECODES[NBitmapsConverter.formats[nformat][0]])
+        pixels.frombytes(words.astype(pixels.typecode).tobytes())
+        return pixels
+
+    @staticmethod
+    def indexedData(image, bpp, backcolor, gamma=None):
+        """ image colors indexes (from bottom to top row) and RGB888
+            palette for 'bpp' bits per pixel or minimum bits if bpp is
+            None, indexed source images with fit colors table passed
+            untouched, others quantized to palette """
+        width, height = image.width(), image.height()
+        colors = None
+
+        if image.format() in (QImage.Format_Indexed8, QImage.Format_Mono, QImage.Format_MonoLSB):
+            source = image.convertToFormat(QImage.Format_Indexed8)
+
+            # source colors table, alfa mixed with backcolor
+            table = np.array(source.colorTable(), dtype=np.uint32)
+            palette = NPalette.fromRGB888(NBitmapsConverter.mixPixels(table, backcolor, gamma))
+
+            bits = source.constBits()
+            bits.setsize(source.byteCount())
+            indexes = np.frombuffer(bits, dtype=np.uint8).reshape(height, source.bytesPerLine())
+            indexes = indexes[::-1, :width].copy()
+
+            if bpp is None:
+                bpp = NPalette.bitsFor(len(table))
+
+            if len(table) <= (1 << bpp):
+                return indexes, palette, bpp
+
+            # colors table too big, quantize source colors
+            colors = palette[indexes.ravel()]
+
+        if colors is None:
+            words = NBitmapsConverter.imagePixels(image, backcolor, 'format32', gamma)
+            colors = NPalette.fromRGB888(words.ravel())
+
+        # colors table is 565_RGB, quantize only different 565_RGB colors
+        colors = colors & np.array([0xF8, 0xFC, 0xF8], dtype=np.uint8)
+
+        if bpp is None:
+            count = len(np.unique(colors.astype(np.uint32) @ np.array([0x10000, 0x100, 1],
+                                                                       dtype=np.uint32)))
+            bpp = NPalette.bitsFor(count)
+
+        indexes, palette = NPalette.quantize(colors, 1 << bpp)
+
+        return indexes.reshape(height, width), palette, bpp
+
+    @staticmethod
+    def imagePixels(image, backcolor, nformat='format16', gamma=None):
+        """ image words (RGB332, RGB565 or RGB888 for nformat) numpy array
+            (height, width), rows from bottom to top, pixels with alfa
+            mixed with backcolor, see mixPixels """
+        fromARGB = { 'format8': NGL_Colors.fromARGB332,
+                     'format16': NGL_Colors.fromARGB,
+                     'format32': NGL_Colors.fromARGB888 }[nformat]
+        dtype = { 'format8': np.uint8,
+                  'format16': np.uint16,
+                  'format32': np.uint32 }[nformat]
+
+        argb = NBitmapsConverter.imageARGB(image)
+
+        # opaque images without alfa mixing
+        if image.hasAlphaChannel():
+            alfa = (argb >> 24) != 0xFF
+            if alfa.any():
+                argb = argb.copy()
+                argb[alfa] = NBitmapsConverter.mixPixels(argb[alfa], backcolor, gamma)
+
+        return fromARGB(argb).astype(dtype)
+
+    @staticmethod
+    def imageARGB(image):
+        """ image 8888_ARGB pixels numpy uint32 array (height, width),
+            rows from bottom to top, view of image bits (valid while image
+            exists) if image is ARGB32, else copy """
+        source = image
+        if image.format() not in (QImage.Format_ARGB32, QImage.Format_RGB32):
+            image = image.convertToFormat(QImage.Format_ARGB32)
+
+        bits = image.constBits()
+        bits.setsize(image.byteCount())
+        argb = np.frombuffer(bits, dtype=np.uint32).reshape(image.height(),
+                                                            image.bytesPerLine() // 4)
+        argb = argb[::-1, :image.width()]
+
+        # RGB32 alfa byte is undefined, always 0xFF
+        if image.format() == QImage.Format_RGB32:
+            return argb | np.uint32(0xFF000000)
+
+        # converted image is temporary, keep own copy of pixels
+        return argb if image is source else argb.copy()
+
+    @staticmethod
+    def mixPixels(argb, backcolor, gamma=None):
+        """ 8888_ARGB pixels array mixed with backcolor, the same as
+            mixColors (QPainter) within 1 LSB, gamma - mix in linear light
+            with this gamma (2.2 for sRGB), None - as QPainter """
+        argb = np.asarray(argb, dtype=np.uint32)
+        alfa = argb >> 24
+        out = np.full(argb.shape, 0xFF000000, dtype=np.uint32)
+
+        for shift, back in zip((16, 8, 0), NGL_Colors.getRGB(backcolor)):
+            color = (argb >> shift) & 0xFF
+
+            if gamma is None:
+                # QPainter source over, premultiplied source plus back
+                # multiplied by inverse alfa, x / 255 rounded as in Qt
+                mix = NBitmapsConverter._div255(color * alfa) + \
+                      NBitmapsConverter._div255(back * (0xFF - alfa))
+            else:
+                linear = (np.arange(256) / 255.0) ** gamma
+                mix = (linear[color] * alfa + linear[back] * (0xFF - alfa)) / 0xFF
+                mix = np.rint(mix ** (1.0 / gamma) * 0xFF).astype(np.uint32)
+
+            out |= mix.astype(np.uint32) << shift
+
+        return out
+
+    @staticmethod
+    def _div255(x):
+        """ x / 255 rounded as Qt qt_div_255 """
+        return (x + (x >> 8) + 0x80) >> 8
+
+    @staticmethod
+    def imageRows(image, backcolor, nformat='format16', gamma=None):
+        """ generator of image rows words (RGB332, RGB565 or RGB888 for
+            nformat), from bottom to top row, pixels with alfa mixed with
+            backcolor """
+        for row in NBitmapsConverter.imagePixels(image, backcolor, nformat, gamma):
+            yield row.tolist()
 
     @staticmethod
     def mixColors(img, backcolor, color, painter):
+        """ mix one color with backcolor by QPainter, reference for
+            mixPixels, return mixed 8888_ARGB pixel (not RGB565 as before
+            mixPixels, NGL_Colors.fromARGB converts it) """
         img.setPixel(0, 0, backcolor.rgb())
 
         painter.begin(img)
@@ -106,4 +605,4 @@ class NBitmapsConverter(object):
         painter.drawPoint(0, 0)
         painter.end()
 
-        return NGL_Colors.fromARGB(img.pixel(0, 0))
\ No newline at end of file
+        return img.pixel(0, 0)
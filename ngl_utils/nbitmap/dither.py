@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+
+class NDither(object):
+    """ Quantize 0..255 values (numpy (height, width) or (height, width,
+        channels) arrays) to 'levels' levels for each channel, return
+        levels indexes array with the same shape
+    """
+
+    # dithering methods names
+    methods = ('none', 'ordered', 'fs')
+
+    @staticmethod
+    def quantize(values, levels, method='none'):
+        """ quantize by method - none, ordered (Bayer 8x8) or fs
+            (Floyd-Steinberg error diffusion) """
+        values = np.asarray(values, dtype=np.float64)
+        levels = NDither._levels(values, levels)
+
+        if method in (None, 'none'):
+            return NDither._nearest(values, levels)
+        elif method == 'ordered':
+            return NDither.ordered(values, levels)
+        elif method == 'fs':
+            return NDither.floydSteinberg(values, levels)
+
+        raise ValueError('unknown dithering method "%s"' % method)
+
+    @staticmethod
+    def ordered(values, levels):
+        """ ordered dithering by Bayer 8x8 thresholds matrix """
+        values = np.asarray(values, dtype=np.float64)
+        levels = NDither._levels(values, levels)
+        height, width = values.shape[:2]
+
+        # thresholds in (0, 1) tiled over image
+        bayer = NDither._bayer(8)
+        thresholds = np.tile((bayer + 0.5) / bayer.size,
+                             (-(-height // 8), -(-width // 8)))[:height, :width]
+        if values.ndim == 3:
+            thresholds = thresholds[:, :, None]
+
+        index = np.floor(values * (levels - 1) / 255.0 + thresholds)
+        return np.clip(index, 0, levels - 1).astype(np.uint8)
+
+    @staticmethod
+    def floydSteinberg(values, levels):
+        """ Floyd-Steinberg error diffusion, pixel (y, x) depends only on
+            pixels with smaller x + 2 * y, so all pixels of each x + 2 * y
+            wavefront are quantized at once """
+        values = np.asarray(values, dtype=np.float64)
+        levels = NDither._levels(values, levels)
+        height, width = values.shape[:2]
+        step = 255.0 / (levels - 1)
+
+        # errors accumulator with one pixel border, border errors dropped
+        errors = np.zeros((height + 1, width + 2) + values.shape[2:])
+        out = np.empty(values.shape, dtype=np.uint8)
+
+        for wave in range(width + 2 * (height - 1)):
+            ys = np.arange(max(0, -(-(wave - width + 1) // 2)), min(height - 1, wave // 2) + 1)
+            xs = wave - 2 * ys
+
+            value = values[ys, xs] + errors[ys, xs + 1]
+            index = np.clip(np.rint(value / step), 0, levels - 1)
+            out[ys, xs] = index
+            error = value - index * step
+
+            errors[ys, xs + 2] += error * (7 / 16.0)
+            errors[ys + 1, xs] += error * (3 / 16.0)
+            errors[ys + 1, xs + 1] += error * (5 / 16.0)
+            errors[ys + 1, xs + 2] += error * (1 / 16.0)
+
+        return out
+
+    @staticmethod
+    def _nearest(values, levels):
+        index = np.rint(values * (levels - 1) / 255.0)
+        return np.clip(index, 0, levels - 1).astype(np.uint8)
+
+    @staticmethod
+    def _levels(values, levels):
+        """ levels count for each channel as broadcastable array """
+        levels = np.asarray(levels, dtype=np.float64)
+        if values.ndim == 3 and levels.ndim == 0:
+            levels = np.full(values.shape[2], float(levels))
+        return levels
+
+    @staticmethod
+    def _bayer(size):
+        """ Bayer thresholds matrix, values 0 .. size * size - 1 """
+        bayer = np.zeros((1, 1), dtype=np.int64)
+        while bayer.shape[0] < size:
+            bayer = np.block([ [4 * bayer, 4 * bayer + 2],
+                               [4 * bayer + 3, 4 * bayer + 1] ])
+        return bayer
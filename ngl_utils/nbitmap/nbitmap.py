@@ -1,9 +1,30 @@
 #!/usr/bin/env python3
 
+import io
+from array import array
+import numpy as np
+
+from ngl_utils.rle import RLEM_TYPECODES
+from ngl_utils.ncodegenerator import NBitmapCodeGen
+
 # ------------------------------------------------------------------------------
 # NGL_Bitmap
 # ------------------------------------------------------------------------------
 class NGL_Bitmap(object):
+    """ Converted bitmap, data is compact words array (array, bytes or
+        NumPy array), code generated on demand if not set """
+
+    __slots__ = ( '_name', '_width', '_height', '_compressed', '_color_bit',
+                  '_data_word_size', '_data_len_bytes', '_datatype', '_data', '_clut',
+                  '_band_rows', '_rows_offsets', '_code', 'data_len_in_words',
+                  'data_len_in_bytes', 'cost', 'atlas', 'region', 'pack', 'pack_address',
+                  'frames', 'pixel_order', 'saved', 'recepients', 'objects' )
+
+    # words formatted by one NumPy pass
+    chunk_words = 0x10000
+
+    # hex digits of 0..15
+    hexdigits = np.frombuffer(b'0123456789abcdef', dtype=np.uint8)
 
     def __init__(self, name, width, height, compress):
         self.name = name
@@ -12,11 +33,24 @@ class NGL_Bitmap(object):
         self.compressed = compress
         self.color_bit = 16
         self.data_word_size = 16
+        self.data_len_in_words = 0
         self.data_len_in_bytes = 0
         self.datatype = 'uint16_t'
         self.data = []
-        self.code = ''
+        self.clut = []
+        self.band_rows = 0
+        self.rows_offsets = None
+        self.cost = None
+        self.atlas = None
+        self.region = None
+        self.pack = None
+        self.pack_address = None
+        self.frames = None
+        self.pixel_order = 'le'
+        self.code = None
+        self.saved = False
         self.recepients = {}
+        self.objects = []
 
     def get_name(self):
         return self._name.replace(' ', '_')
@@ -61,9 +95,30 @@ class NGL_Bitmap(object):
     def get_data(self):
         return self._data
     def set_data(self, data):
+        # list of ints takes 28+ bytes per word, keep words array
+        if isinstance(data, list):
+            data = array(RLEM_TYPECODES[self.data_word_size], data)
         self._data = data
 
+    def get_clut(self):
+        return self._clut
+    def set_clut(self, clut):
+        self._clut = clut
+
+    def get_band_rows(self):
+        return self._band_rows
+    def set_band_rows(self, band_rows):
+        self._band_rows = band_rows
+
+    def get_rows_offsets(self):
+        return self._rows_offsets
+    def set_rows_offsets(self, rows_offsets):
+        self._rows_offsets = rows_offsets
+
     def get_code(self):
+        # generated code not kept, bitmap data is in code string again
+        if self._code is None:
+            return NBitmapCodeGen.bitmap(self)
         return self._code
     def set_code(self, code):
         self._code = code
@@ -77,27 +132,66 @@ class NGL_Bitmap(object):
     data_len_bytes = property( get_data_len_bytes, set_data_len_bytes )
     datatype = property( get_datatype, set_datatype )
     data = property( get_data, set_data )
+    clut = property( get_clut, set_clut )
+    band_rows = property( get_band_rows, set_band_rows )
+    rows_offsets = property( get_rows_offsets, set_rows_offsets )
     code = property( get_code, set_code )
 
 
     def formatedData(self):
-        crop = 0
-        tstr = '\t'
-        data = self.data
-        format_data = []
-
-        for word in data:
-            tstr += '0x%x, ' % word
-            crop += 1
-            if crop >= self.width:
-                format_data.append( tstr + '\n' )
-                tstr = '\t'
-                crop = 0
-
-        if crop != 0:
-            format_data.append( tstr + '\n' )
-
-        return ''.join( format_data )
+        out = io.StringIO()
+        self.writeData(out)
+        return out.getvalue()
+
+    def writeData(self, out):
+        """ Write data as C array lines of bitmap width words to 'out'
+            file object, full data string not created """
+        return NGL_Bitmap.writeWords(out, self.data, self.data_word_size, self.width)
+
+    def writeCode(self, out):
+        """ Write code to 'out' file object, generated code written by
+            parts around data lines """
+        if self._code is not None:
+            out.write(self._code)
+        else:
+            NBitmapCodeGen.writeBitmap(self, out)
+
+    @staticmethod
+    def writeWords(out, words, word_size, line_words):
+        """ Write words (array, bytes, NumPy array) as C array lines of
+            'line_words' fixed width hex words, '\\t0x00ff, 0x0100, \\n',
+            lines of each chunk formatted as one NumPy bytes array.
+            Return words count """
+        if isinstance(words, (bytes, bytearray)):
+            words = np.frombuffer(words, dtype=np.uint8)
+        words = np.asarray(words)
+
+        # '0x' + hex digits + ', '
+        digits = word_size // 4
+        cell = digits + 4
+        shifts = np.arange(digits - 1, -1, -1, dtype=np.uint64) * np.uint64(4)
+        chunk = max(NGL_Bitmap.chunk_words // line_words, 1) * line_words
+
+        for start in range(0, len(words), chunk):
+            part = words[start:start + chunk].astype(np.uint64)
+
+            cells = np.empty((len(part), cell), dtype=np.uint8)
+            cells[:, :2] = np.frombuffer(b'0x', dtype=np.uint8)
+            cells[:, 2:-2] = NGL_Bitmap.hexdigits[(part[:, None] >> shifts) & np.uint64(0xF)]
+            cells[:, -2:] = np.frombuffer(b', ', dtype=np.uint8)
+
+            # full lines with tab and new line, the last line may be shorter
+            full = len(part) // line_words * line_words
+            lines = np.empty((full // line_words, line_words * cell + 2), dtype=np.uint8)
+            lines[:, 0] = ord('\t')
+            lines[:, 1:-1] = cells[:full].reshape(len(lines), line_words * cell)
+            lines[:, -1] = ord('\n')
+            out.write(lines.tobytes().decode('ascii'))
+
+            if full < len(part):
+                out.write('\t%s\n' % cells[full:].tobytes().decode('ascii'))
+
+        return len(words)
 
     def codeSize(self):
         """ Calc estimate MCU code size """
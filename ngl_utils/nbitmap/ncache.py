@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import os
+import pickle
+import hashlib
+
+from ngl_utils.nbitmap.nbitmap import NGL_Bitmap
+
+
+class NBitmapsCache(object):
+    """ On-disk cache of converted NGL_Bitmap objects, key is hash of
+        bitmap file bytes, bitmap name, conversion params and ngl_utils
+        code and templates, least recently used files are removed when
+        cache exceeds max_size bytes
+    """
+
+    # cached objects format version, change if NGL_Bitmap changed
+    version = 5
+
+    # hash of ngl_utils code and templates, cached bitmaps of other
+    # converters and codecs code not used
+    _code_hash = None
+
+    # default cache size in bytes
+    max_size = 64 * 1024 * 1024
+
+    def __init__(self, path=None, max_size=None):
+        super(NBitmapsCache, self).__init__()
+
+        if path is None:
+            base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'),
+                                                                    '.cache')
+            path = os.path.join(base, 'ngl_utils', 'bitmaps')
+
+        self.path = path
+        if max_size is not None:
+            self.max_size = max_size
+
+    def key(self, path, params):
+        """ cache key for bitmap file and conversion params tuple """
+        sha = hashlib.sha256()
+
+        with open(path, 'rb') as f:
+            sha.update(f.read())
+
+        name = os.path.basename(path).split('.')[0]
+        sha.update(repr((self.version, self.codeHash(), name, params)).encode())
+
+        return sha.hexdigest()
+
+    @staticmethod
+    def codeHash():
+        """ hash of ngl_utils package python code and code templates """
+        if NBitmapsCache._code_hash is None:
+            package = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            sha = hashlib.sha256()
+
+            for root, dirs, files in os.walk(package):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith(('.py', '.ntp')):
+                        fpath = os.path.join(root, name)
+                        sha.update(os.path.relpath(fpath, package).encode())
+                        with open(fpath, 'rb') as f:
+                            sha.update(f.read())
+
+            NBitmapsCache._code_hash = sha.hexdigest()
+
+        return NBitmapsCache._code_hash
+
+    def get(self, key):
+        """ cached NGL_Bitmap or None, hit marks file as recently used,
+            not readable or not unpickled file is miss """
+        fpath = self._file(key)
+
+        try:
+            with open(fpath, 'rb') as f:
+                bitmap = pickle.load(f)
+            os.utime(fpath, None)
+        except Exception:
+            return None
+
+        if not isinstance(bitmap, NGL_Bitmap):
+            return None
+
+        return bitmap
+
+    def put(self, key, bitmap):
+        """ store NGL_Bitmap, then remove least recently used files """
+        os.makedirs(self.path, exist_ok=True)
+
+        # write to temp file and replace, readers never see part of file
+        fpath = self._file(key)
+        tmp = '%s.%d.tmp' % (fpath, os.getpid())
+        with open(tmp, 'wb') as f:
+            pickle.dump(bitmap, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, fpath)
+
+        self.evict()
+
+    def evict(self):
+        """ remove least recently used files over max_size """
+        files = []
+        for entry in os.scandir(self.path):
+            if entry.name.endswith('.pickle'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, fpath in sorted(files):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(fpath)
+            except OSError:
+                pass
+            total -= size
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.pickle')
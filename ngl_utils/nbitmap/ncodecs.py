@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+from array import array
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice
+from PyQt5.QtGui import QImage
+
+from ngl_utils.nplugins.widgets.ngl_colors import NGL_Colors
+from ngl_utils.rle import RLEM_TYPECODES, rlem_encode, rlem_encode_bands, rlem_decode
+from ngl_utils.lzss import lzss_encode, lzss_decode
+
+
+class NBitmapCodec(object):
+    """ Base bitmap data codec, each codec provides:
+        name - compress type name, used in ngluic options
+        id - NGL_Image compressed flag value
+        data_width - encoded data word bits, None - same as pixels word
+        lossless - reference decode returns exactly source pixels
+        from_image - encode QImage, source pixels words not used
+        decoder - C decoder code template name, None - decoder in NGL
+        bands - encode by independent rows bands with offsets table
+        decode_cycles - estimated MCU decode cycles per pixel
+        auto - tried by AUTO compress, others only by name or AUTO+name
+    """
+    name = ''
+    id = 0
+    data_width = None
+    lossless = True
+    from_image = False
+    decoder = None
+    bands = False
+    decode_cycles = 1
+    auto = True
+
+    @classmethod
+    def encode(cls, image, pixels, width, quality=100, optimal=False):
+        """ encode image or it pixels words, return encoded data list
+            (or bytes for 8-bit data) """
+        raise NotImplementedError
+
+    @classmethod
+    def encodeBands(cls, pixels, width, band_words, optimal=False):
+        """ encode pixels words by bands of 'band_words' words, return
+            encoded data list and bands start offsets list """
+        raise NotImplementedError
+
+    @classmethod
+    def decode(cls, data, width):
+        """ reference decode, return array of pixels words """
+        raise NotImplementedError
+
+    @classmethod
+    def decoderParams(cls, width):
+        """ params for C decoder code template """
+        return { 'width': width, 'datatype': 'uint%d_t' % width }
+
+    @classmethod
+    def dataWidth(cls, width):
+        """ encoded data word bits for pixels word width """
+        return cls.data_width or width
+
+
+class NNoneCodec(NBitmapCodec):
+    """ Not compressed pixels words """
+    name = 'None'
+    id = 0
+
+    @classmethod
+    def encode(cls, image, pixels, width, quality=100, optimal=False):
+        return array(pixels.typecode, pixels)
+
+    @classmethod
+    def decode(cls, data, width):
+        return array(RLEM_TYPECODES[width], data)
+
+
+class NRLECodec(NBitmapCodec):
+    """ RLEm compressed pixels words, see ngl_utils.rle """
+    name = 'RLE'
+    id = 1
+    decoder = 'rle_decode'
+    bands = True
+    decode_cycles = 2
+
+    @classmethod
+    def encode(cls, image, pixels, width, quality=100, optimal=False):
+        # all pixels in memory, vectorized encoder, stream encoder only
+        # for streamed bitmaps
+        return array(RLEM_TYPECODES[width], rlem_encode(pixels, optimal, width))
+
+    @classmethod
+    def encodeBands(cls, pixels, width, band_words, optimal=False):
+        return rlem_encode_bands(pixels, band_words, optimal, width)
+
+    @classmethod
+    def decode(cls, data, width):
+        return rlem_decode(data, width)
+
+    @classmethod
+    def decoderParams(cls, width):
+        params = super(NRLECodec, cls).decoderParams(width)
+        flag = 1 << (width - 1)
+        params.update(flag = hex(flag), mask = hex(flag - 1))
+        return params
+
+
+class NJPGCodec(NBitmapCodec):
+    """ JPEG image bytes, lossy """
+    name = 'JPG'
+    id = 2
+    data_width = 8
+    lossless = False
+    from_image = True
+    decode_cycles = 100
+
+    @classmethod
+    def encode(cls, image, pixels, width, quality=100, optimal=False):
+        # save image as jpg to memory buffer
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, 'JPG', quality)
+        buffer.close()
+
+        return bytes(data)
+
+    @classmethod
+    def decode(cls, data, width):
+        image = QImage.fromData(bytes(data), 'JPG')
+        fromARGB = { 8: NGL_Colors.fromARGB332,
+                     16: NGL_Colors.fromARGB,
+                     32: NGL_Colors.fromARGB888 }[width]
+
+        return array(RLEM_TYPECODES[width],
+                     [ fromARGB(image.pixel(x, y))
+                       for y in range(image.height()-1, -1, -1)
+                       for x in range(image.width()) ])
+
+
+class NLZSSCodec(NBitmapCodec):
+    """ LZSS (heatshrink-style) compressed pixels words bytes,
+        words in little-endian bytes order (big-endian for 'be' pixel
+        order), one bytes decoder for all widths, see ngl_utils.lzss """
+    name = 'LZSS'
+    id = 3
+    data_width = 8
+    decoder = 'lzss_decode'
+    decode_cycles = 6
+    # not in NGL firmware decoders, AUTO+LZSS to try it
+    auto = False
+    window_bits = 8
+    lookahead_bits = 4
+
+    @classmethod
+    def encode(cls, image, pixels, width, quality=100, optimal=False):
+        data = array(RLEM_TYPECODES[width], pixels).tobytes()
+        return [ byte for byte in lzss_encode(data,
+                                              cls.window_bits,
+                                              cls.lookahead_bits) ]
+
+    @classmethod
+    def decode(cls, data, width):
+        words = array(RLEM_TYPECODES[width])
+        words.frombytes(lzss_decode(data, cls.window_bits, cls.lookahead_bits))
+        return words
+
+    @classmethod
+    def decoderParams(cls, width):
+        params = super(NLZSSCodec, cls).decoderParams(width)
+        params.update(window_bits = cls.window_bits,
+                      lookahead_bits = cls.lookahead_bits,
+                      window_size = 1 << cls.window_bits)
+        return params
+
+
+class NBitmapCodecs(object):
+    """ Bitmap codecs registry """
+
+    _codecs = []
+
+    @staticmethod
+    def register(codec):
+        """ register new codec, codec name and id must be unique """
+        for c in NBitmapCodecs._codecs:
+            if c.name.lower() == codec.name.lower() or c.id == codec.id:
+                raise ValueError('codec "%s" or id %s already registered' % (codec.name,
+                                                                             codec.id))
+        NBitmapCodecs._codecs.append(codec)
+        return codec
+
+    @staticmethod
+    def get(name):
+        """ get codec by compress type name, not case sensitive """
+        for codec in NBitmapCodecs._codecs:
+            if codec.name.lower() == str(name).lower():
+                return codec
+        raise KeyError('unknown bitmap codec "%s"' % name)
+
+    @staticmethod
+    def names():
+        """ all registered codecs names """
+        return [codec.name for codec in NBitmapCodecs._codecs]
+
+    @staticmethod
+    def codecs(auto=False):
+        """ all registered codecs, auto - only codecs tried by AUTO """
+        return [ codec for codec in NBitmapCodecs._codecs if codec.auto or not auto ]
+
+    @staticmethod
+    def select(name):
+        """ codecs for compress type name, codec name, AUTO - codecs
+            tried by AUTO, AUTO+LZSS - AUTO codecs and named codecs,
+            not case sensitive """
+        names = str(name).split('+')
+        if names[0].upper() != 'AUTO':
+            return [NBitmapCodecs.get(name)]
+
+        codecs = NBitmapCodecs.codecs(auto=True)
+        for codec in map(NBitmapCodecs.get, names[1:]):
+            if codec not in codecs:
+                codecs.append(codec)
+        return codecs
+
+    @staticmethod
+    def isAuto(name):
+        """ compress type name is AUTO or AUTO with named codecs """
+        return str(name).split('+')[0].upper() == 'AUTO'
+
+
+NBitmapCodecs.register(NNoneCodec)
+NBitmapCodecs.register(NRLECodec)
+NBitmapCodecs.register(NJPGCodec)
+NBitmapCodecs.register(NLZSSCodec)
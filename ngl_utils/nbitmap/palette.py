@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+
+class NPalette(object):
+    """ Indexed colors (palette) bitmaps helpers, RGB888 colors are
+        numpy (n, 3) arrays, colors indexes are numpy arrays
+    """
+
+    # available bits per pixel for indexed bitmaps
+    bits = (1, 2, 4, 8)
+
+    @staticmethod
+    def bitsFor(count):
+        """ minimum bits per pixel for colors count """
+        for bpp in NPalette.bits:
+            if count <= (1 << bpp):
+                return bpp
+        return NPalette.bits[-1]
+
+    @staticmethod
+    def fromRGB888(words):
+        """ split 888_RGB words to (n, 3) colors array """
+        words = np.asarray(words, dtype=np.uint32)
+        return np.stack(((words >> 16) & 0xFF, (words >> 8) & 0xFF, words & 0xFF),
+                        axis=-1).astype(np.uint8)
+
+    @staticmethod
+    def toRGB565(colors):
+        """ (n, 3) colors array to list of 565_RGB words """
+        colors = np.asarray(colors, dtype=np.uint16)
+        words = ((colors[:, 0] & 0xF8) << 8) | ((colors[:, 1] & 0xFC) << 3) | (colors[:, 2] >> 3)
+        return words.tolist()
+
+    @staticmethod
+    def quantize(colors, count):
+        """ quantize (n, 3) colors to 'count' colors palette, median cut
+            of unique colors, refined by nearest palette color,
+            return (colors indexes, palette colors) """
+        colors = np.asarray(colors, dtype=np.uint8)
+        keys = (colors[:, 0].astype(np.uint32) << 16) | (colors[:, 1].astype(np.uint32) << 8) | colors[:, 2]
+        unique, inverse, weights = np.unique(keys, return_inverse=True, return_counts=True)
+        ucolors = NPalette.fromRGB888(unique).astype(np.int64)
+
+        # few colors, palette is exactly unique colors
+        if len(unique) <= count:
+            return inverse.reshape(-1).astype(np.uint8), ucolors.astype(np.uint8)
+
+        labels = NPalette._medianCut(ucolors, weights, count)
+
+        # palette is weighted mean of each box, refine labels by nearest color
+        palette = NPalette._boxesMean(ucolors, weights, labels, labels.max() + 1)
+        labels = NPalette.nearest(ucolors, palette)
+
+        return labels[inverse.reshape(-1)].astype(np.uint8), palette.astype(np.uint8)
+
+    @staticmethod
+    def nearest(colors, palette, chunk=4096):
+        """ nearest palette color index for each color """
+        colors = np.asarray(colors, dtype=np.int64)
+        palette = np.asarray(palette, dtype=np.int64)
+        labels = np.empty(len(colors), dtype=np.int64)
+
+        for i in range(0, len(colors), chunk):
+            part = colors[i:i + chunk, None, :] - palette[None, :, :]
+            labels[i:i + chunk] = np.argmin((part * part).sum(axis=2), axis=1)
+
+        return labels
+
+    @staticmethod
+    def pack(indexes, bpp):
+        """ pack (height, width) colors indexes to bytes, MSB first pixel,
+            each row starts from new byte """
+        indexes = np.asarray(indexes, dtype=np.uint8)
+        height, width = indexes.shape
+        ppb = 8 // bpp
+
+        # pad rows to full bytes
+        padded = np.zeros((height, -(-width // ppb) * ppb), dtype=np.uint8)
+        padded[:, :width] = indexes
+
+        shifts = (8 - bpp - bpp * np.arange(ppb)).astype(np.uint8)
+        groups = padded.reshape(height, -1, ppb) << shifts
+        return np.bitwise_or.reduce(groups, axis=2).astype(np.uint8).ravel()
+
+    @staticmethod
+    def _medianCut(colors, weights, count):
+        """ split colors to 'count' boxes by weighted median of widest
+            channel, return box label for each color """
+        labels = np.zeros(len(colors), dtype=np.int64)
+        boxes = [np.arange(len(colors))]
+
+        while len(boxes) < count:
+            # box with largest channel range, weighted by pixels count
+            scores = []
+            for box in boxes:
+                if len(box) < 2:
+                    scores.append(-1)
+                    continue
+                span = colors[box].max(axis=0) - colors[box].min(axis=0)
+                scores.append(int(span.max()) * int(weights[box].sum()))
+
+            index = int(np.argmax(scores))
+            if scores[index] <= 0:
+                break
+
+            # split by weighted median of widest channel
+            box = boxes[index]
+            channel = np.argmax(colors[box].max(axis=0) - colors[box].min(axis=0))
+            box = box[np.argsort(colors[box, channel], kind='stable')]
+            cumulative = np.cumsum(weights[box])
+            cut = int(np.searchsorted(cumulative, cumulative[-1] / 2.0))
+            cut = min(max(cut, 1), len(box) - 1)
+
+            boxes[index] = box[:cut]
+            boxes.append(box[cut:])
+
+        for label, box in enumerate(boxes):
+            labels[box] = label
+
+        return labels
+
+    @staticmethod
+    def _boxesMean(colors, weights, labels, count):
+        """ weighted mean color of each box """
+        total = np.bincount(labels, weights=weights, minlength=count)
+        mean = np.stack([ np.bincount(labels, weights=colors[:, c] * weights, minlength=count)
+                          for c in range(3) ], axis=-1)
+        return np.rint(mean / np.maximum(total, 1)[:, None]).astype(np.int64)
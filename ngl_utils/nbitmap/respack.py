@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+import mmap
+import struct
+
+import numpy as np
+
+
+class NResourcePack(object):
+    """ Binary resources pack for external flash, little-endian:
+        header - magic 'NGLR', version, entries count, index size, pack size
+        index - for each entry payload offset, payload size and name
+        payloads - each payload starts at 'align' bytes aligned offset
+    """
+
+    magic = b'NGLR'
+    version = 1
+
+    # entry name field bytes, names stored with zero terminator
+    name_size = 24
+
+    # header and index entry structs
+    header = struct.Struct('<4sHHII')
+    entry = struct.Struct('<II%ds' % name_size)
+
+    def __init__(self, align=4, base=0):
+        super(NResourcePack, self).__init__()
+
+        if align < 1 or align & (align - 1):
+            raise ValueError('resource pack align must be power of 2, not %d' % align)
+
+        self.align = align
+        self.base = base
+        self.entries = []
+
+    @staticmethod
+    def payload(data, word_size):
+        """ little-endian bytes of data words with word_size bits """
+        if isinstance(data, (bytes, bytearray)):
+            return bytes(data)
+        return np.asarray(data, dtype='<u%d' % (word_size // 8)).tobytes()
+
+    @staticmethod
+    def entryName(name):
+        """ name bytes stored in index, not more than name_size - 1 """
+        return name.encode()[:NResourcePack.name_size - 1]
+
+    def add(self, name, payload):
+        """ add payload bytes, payloads offsets are known after all
+            payloads added, see addresses. Names stored in index must
+            be unique """
+        stored = self.entryName(name)
+        for other, _ in self.entries:
+            if self.entryName(other) == stored:
+                raise ValueError('resource pack names "%s" and "%s" are the same in '
+                                 'index, names first %d bytes stored' % (
+                                 other, name, self.name_size - 1))
+        self.entries.append((name, payload))
+
+    def addresses(self):
+        """ payloads addresses - pack base plus payloads offsets """
+        return [ self.base + offset for offset in self.offsets() ]
+
+    def offsets(self):
+        """ aligned payloads offsets, payloads placed after index """
+        offset = self.header.size + self.entry.size * len(self.entries)
+        offsets = []
+
+        for _, payload in self.entries:
+            offset = -(-offset // self.align) * self.align
+            offsets.append(offset)
+            offset += len(payload)
+
+        return offsets
+
+    def size(self):
+        """ pack size in bytes """
+        if not self.entries:
+            return self.header.size
+        return self.offsets()[-1] + len(self.entries[-1][1])
+
+    def build(self):
+        """ pack bytes, padding bytes are 0xFF as erased flash """
+        offsets = self.offsets()
+        blob = bytearray(b'\xFF' * self.size())
+
+        self.header.pack_into(blob, 0, self.magic, self.version, len(self.entries),
+                              self.entry.size * len(self.entries), len(blob))
+
+        for i, ((name, payload), offset) in enumerate(zip(self.entries, offsets)):
+            self.entry.pack_into(blob, self.header.size + i * self.entry.size,
+                                 offset, len(payload), self.entryName(name))
+            blob[offset:offset + len(payload)] = payload
+
+        return blob
+
+    def write(self, path):
+        """ write pack file in one bulk write """
+        with open(path, 'wb') as f:
+            f.write(self.build())
+
+    @staticmethod
+    def read(path):
+        """ read pack file by mmap, return list of (name, offset, payload) """
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            magic, version, count, index_size, size = NResourcePack.header.unpack_from(m, 0)
+
+            if magic != NResourcePack.magic or size != len(m):
+                raise ValueError('"%s" is not resource pack' % path)
+
+            entries = []
+            for i in range(count):
+                offset, length, name = NResourcePack.entry.unpack_from(
+                    m, NResourcePack.header.size + i * NResourcePack.entry.size)
+                entries.append((name.rstrip(b'\0').decode(errors='surrogateescape'), offset,
+                                bytes(m[offset:offset + length])))
+
+        return entries
+
+    def verify(self, path, addresses):
+        """ names of entries with not equal payload in pack file or
+            address (dict of name to address used by code) not equal to
+            pack base plus offset in pack file index """
+        entries = dict((name.encode(errors='surrogateescape'), (offset, payload))
+                       for name, offset, payload in NResourcePack.read(path))
+
+        bad = []
+        for name, payload in self.entries:
+            offset, data = entries.get(self.entryName(name), (None, None))
+            if (data != payload or offset is None or
+                    addresses.get(name) != self.base + offset):
+                bad.append(name)
+
+        return bad
@@ -5,6 +5,8 @@ import sys
 from datetime import datetime
 import pkg_resources
 
+from ngl_utils.nbitmap.ncodecs import NBitmapCodecs
+
 
 class NCodeService(object):
     """docstring for NCodeService"""
@@ -439,24 +441,253 @@ class NFontCodeGen(object):
 class NBitmapCodeGen(object):
     """docstring for NBitmapCodeGen"""
 
+    # NGL_Image compressed flag of atlas region bitmaps
+    region_id = 0x80
+
+    # NGL_Image compressed flag bit of bitmaps with data in resource pack
+    pack_id = 0x40
+
+    # NGL_Image compressed flag bit of bitmaps with big endian pixels words
+    swap_id = 0x20
+
+    # data lines placeholder of bitmap code written by parts
+    data_mark = '\0data\0'
+
+    # generated header with bitmaps types not defined by NGL.h v1.0
+    types_header = 'ngl_image_types.h'
+
     @staticmethod
-    def bitmap(bitmap):
-        # get template
+    def bitmap(bitmap, data=None):
+        # get template, atlas region bitmaps have no data,
+        # indexed bitmaps have colors table, animation keyframe
+        # followed by frames table, data - data lines or None for
+        # bitmap formated data
+        if bitmap.atlas:
+            return NBitmapCodeGen.regionBitmap(bitmap)
+        if bitmap.clut:
+            return NBitmapCodeGen.indexedBitmap(bitmap, data) + NBitmapCodeGen.animation(bitmap)
+
         template = NCodeService.resourceTemplate('bitmap')
 
         # format template with bitmap object params
         return template.format(
             name = bitmap.name,
+            include = NBitmapCodeGen.typesInclude(bitmap),
             width = bitmap.width-1,
             height = bitmap.height-1,
-            compressed = bitmap.compressed,
+            compressed = NBitmapCodeGen.compressedFlag(bitmap),
             color_bit = bitmap.color_bit,
             data_word_size = bitmap.data_word_size,
             data_len_in_words = bitmap.data_len_in_words,
-            data_len_in_bytes = bitmap.data_len_in_bytes,
+            data_array = NBitmapCodeGen.dataArray(bitmap, data),
+            data_point = NBitmapCodeGen.dataPoint(bitmap),
+            rows = NBitmapCodeGen.rowsOffsets(bitmap)) + NBitmapCodeGen.animation(bitmap)
+
+    @staticmethod
+    def indexedBitmap(bitmap, data=None):
+        """ generate code for indexed bitmap with 565_RGB colors table
+        """
+        template = NCodeService.resourceTemplate('bitmap_indexed')
+
+        clut = ''.join( '\t%s\n' % ''.join('0x%x, ' % c for c in bitmap.clut[i:i + 16])
+                        for i in range(0, len(bitmap.clut), 16) )
+
+        return template.format(
+            name = bitmap.name,
+            width = bitmap.width-1,
+            height = bitmap.height-1,
+            compressed = NBitmapCodeGen.compressedFlag(bitmap),
+            color_bit = bitmap.color_bit,
+            data_word_size = bitmap.data_word_size,
+            data_len_in_words = bitmap.data_len_in_words,
+            data_array = NBitmapCodeGen.dataArray(bitmap, data),
+            data_point = NBitmapCodeGen.dataPoint(bitmap),
+            clut_len = len(bitmap.clut),
+            clut_len_in_bytes = len(bitmap.clut) * 2,
+            clut = clut,
+            rows = NBitmapCodeGen.rowsOffsets(bitmap))
+
+    @staticmethod
+    def regionBitmap(bitmap):
+        """ generate code for atlas region bitmap, NGL_Image with region
+            compressed flag and point to region in atlas bitmap
+        """
+        template = NCodeService.resourceTemplate('bitmap_region')
+        x, y = bitmap.region
+
+        return template.format(
+            name = bitmap.name,
+            atlas = bitmap.atlas,
+            x = x,
+            y = y,
+            width = bitmap.width-1,
+            height = bitmap.height-1,
+            compressed = hex(NBitmapCodeGen.region_id),
+            color_bit = bitmap.color_bit,
+            data_word_size = bitmap.data_word_size)
+
+    @staticmethod
+    def streamHead(bitmap, strip_rows):
+        """ generate bitmap code before data words of streamed bitmap,
+            data array without size, see streamTail
+        """
+        head = NCodeService.resourceTemplate('bitmap').split('{data_array}')[0]
+        data_head = NCodeService.resourceTemplate('bitmap_stream').split('{data}')[0]
+
+        return head.format(
+            name = bitmap.name,
+            include = NBitmapCodeGen.typesInclude(bitmap),
+            compressed = NBitmapCodeGen.compressedFlag(bitmap)) + data_head.format(
+            name = bitmap.name,
+            datatype = bitmap.datatype,
+            strip_rows = strip_rows)
+
+    @staticmethod
+    def streamTail(bitmap):
+        """ generate bitmap code after data words of streamed bitmap
+        """
+        tail = NCodeService.resourceTemplate('bitmap').split('{data_array}')[1]
+        data_tail = NCodeService.resourceTemplate('bitmap_stream').split('{data}')[1]
+
+        return data_tail.format() + tail.format(
+            name = bitmap.name,
+            width = bitmap.width-1,
+            height = bitmap.height-1,
+            compressed = NBitmapCodeGen.compressedFlag(bitmap),
+            color_bit = bitmap.color_bit,
+            data_word_size = bitmap.data_word_size,
+            data_len_in_words = bitmap.data_len_in_words,
+            data_point = NBitmapCodeGen.dataPoint(bitmap),
+            rows = NBitmapCodeGen.rowsOffsets(bitmap))
+
+    @staticmethod
+    def compressedFlag(bitmap):
+        """ NGL_Image compressed flag, codec id with resource pack and
+            big endian pixels bits
+        """
+        flag = NBitmapCodecs.get(bitmap.compressed).id
+        if bitmap.pack_address is not None:
+            flag |= NBitmapCodeGen.pack_id
+        if bitmap.pixel_order == 'be':
+            flag |= NBitmapCodeGen.swap_id
+
+        return flag if flag < NBitmapCodeGen.swap_id else hex(flag)
+
+    @staticmethod
+    def writeBitmap(bitmap, out):
+        """ write code for bitmap to 'out' file object, code around data
+            formated from templates, data lines written by bitmap
+        """
+        code = NBitmapCodeGen.bitmap(bitmap, NBitmapCodeGen.data_mark)
+        if NBitmapCodeGen.data_mark not in code:
+            out.write(code)
+            return
+
+        head, tail = code.split(NBitmapCodeGen.data_mark)
+        out.write(head)
+        bitmap.writeData(out)
+        out.write(tail)
+
+    @staticmethod
+    def dataArray(bitmap, data=None):
+        """ generate code for bitmap data array, or comment for bitmap
+            with data in resource pack
+        """
+        if bitmap.pack_address is not None:
+            return NCodeService.resourceTemplate('bitmap_pack').format(
+                name = bitmap.name,
+                pack = bitmap.pack,
+                address = hex(bitmap.pack_address),
+                data_len_in_bytes = bitmap.data_len_in_bytes)
+
+        return NCodeService.resourceTemplate('bitmap_data').format(
+            name = bitmap.name,
             datatype = bitmap.datatype,
-            data = bitmap.formatedData()
-        ).replace('None', '0').replace('RLE', '1').replace('JPG', '2')
+            data_len_in_words = bitmap.data_len_in_words,
+            data_len_in_bytes = bitmap.data_len_in_bytes,
+            data = bitmap.formatedData() if data is None else data)
+
+    @staticmethod
+    def dataPoint(bitmap):
+        """ NGL_Image data point, data array or resource pack address
+        """
+        if bitmap.pack_address is not None:
+            return '(void*)%s' % hex(bitmap.pack_address)
+        return '%s_data' % bitmap.name
+
+    @staticmethod
+    def animation(bitmap):
+        """ generate code for animation frames table of keyframe bitmap,
+            empty if bitmap is not animation
+        """
+        if not bitmap.frames:
+            return ''
+
+        template = NCodeService.resourceTemplate('bitmap_anim')
+        frames = ''.join( '\t{ %d, %d, %d, (NGL_Image*)%s },\n' % (
+                          x, y, delay, '&' + frame if frame else '0')
+                          for x, y, delay, frame in bitmap.frames )
+
+        externs = ''.join( 'extern const NGL_Image %s;\n' % frame
+                           for _, _, _, frame in bitmap.frames if frame )
+
+        return template.format(
+            name = bitmap.name,
+            externs = externs,
+            count = len(bitmap.frames),
+            frames = frames)
+
+    @staticmethod
+    def rowsOffsets(bitmap):
+        """ generate code for bitmap rows bands offsets table, empty if
+            bitmap data not encoded by rows bands
+        """
+        if not bitmap.rows_offsets:
+            return ''
+
+        offsets = bitmap.rows_offsets
+        template = NCodeService.resourceTemplate('bitmap_rows')
+
+        return template.format(
+            name = bitmap.name,
+            band_rows = bitmap.band_rows,
+            bands = len(offsets),
+            offsets = ''.join( '\t%s\n' % ''.join('%d, ' % o for o in offsets[i:i + 16])
+                               for i in range(0, len(offsets), 16) ))
+
+    @staticmethod
+    def decoder(codec, width):
+        """ generate codec decoder code for 8, 16 or 32-bit data words
+        """
+        return NCodeService.resourceTemplate(codec.decoder).format(
+            **codec.decoderParams(width))
+
+    @staticmethod
+    def usesImageTypes(bitmap):
+        """ True if bitmap code uses types of ngl_image_types.h
+        """
+        return bool(bitmap.clut or bitmap.atlas or bitmap.frames) or \
+               bitmap.rows_offsets is not None
+
+    @staticmethod
+    def typesInclude(bitmap):
+        """ include line of bitmaps types header for NGL_Image bitmap
+            code, empty if not used
+        """
+        if not NBitmapCodeGen.usesImageTypes(bitmap):
+            return ''
+        return '#include "%s"\n' % NBitmapCodeGen.types_header
+
+    @staticmethod
+    def generateImageTypesHeader(bitmaps):
+        """ generate code for bitmaps types header file, None if bitmaps
+            use NGL_Image only
+        """
+        if not any(NBitmapCodeGen.usesImageTypes(bmp) for bmp in bitmaps):
+            return None
+
+        return NCodeService.resourceTemplate('image_types').format(
+            date = datetime.now())
 
     @staticmethod
     def generateBitmapsHeader(bitmaps):
@@ -467,7 +698,16 @@ class NBitmapCodeGen(object):
 
         bitmaps_code = ''
         for bmp in bitmaps:
-            bitmaps_code += 'extern NGL_Image %s;\n' % bmp.name
+            image_type = 'NGL_IndexedImage' if bmp.clut else 'NGL_Image'
+            bitmaps_code += 'extern %s %s;\n' % (image_type, bmp.name)
+            if bmp.rows_offsets:
+                bitmaps_code += 'extern NGL_ImageRows %s_rows;\n' % bmp.name
+            if bmp.frames:
+                bitmaps_code += 'extern NGL_Animation %s_anim;\n' % bmp.name
+
+        typedefs = ''
+        if any(NBitmapCodeGen.usesImageTypes(bmp) for bmp in bitmaps):
+            typedefs = '#include "%s"\n' % NBitmapCodeGen.types_header
 
         return header_template.format(
             pageName = '',
@@ -477,7 +717,7 @@ class NBitmapCodeGen(object):
             header_define = '__NGL_BITMAPS_H',
             defines = '',
             macros = '',
-            typedefs = '',
+            typedefs = typedefs,
             functionPrototypes = '',
             int_vars = '',
             varsText = bitmaps_code )
@@ -3,16 +3,26 @@
 import sys
 import os
 import argparse
+import re
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 from PyQt5.QtWidgets import QApplication
-from PyQt5.QtGui import QImage
+from PyQt5.QtGui import QImage, QImageReader
 
 from ngl_utils.uiparser import UIParser
 from ngl_utils.nfont.nfont import NGL_Font
 from ngl_utils.nfont.converter import NFontConverter
 from ngl_utils.nbitmap.converter import NBitmapsConverter
+from ngl_utils.nbitmap.ncodecs import NBitmapCodecs
+from ngl_utils.nbitmap.ncache import NBitmapsCache
+from ngl_utils.nbitmap.nbitmap import NGL_Bitmap
+from ngl_utils.nbitmap.atlas import NAtlas
+from ngl_utils.nbitmap.respack import NResourcePack
+from ngl_utils.nbitmap.budget import NFlashBudget
 from ngl_utils.ncodegenerator import ( NCodeService, NCodeGen, NFontCodeGen,
                                        NBitmapCodeGen )
 
+from ngl_utils.rle import rlem_report
 from ngl_utils.messages import inform, error, newline
 
 __version__ = "1.5.0"
@@ -80,49 +90,473 @@ class NUIC(object):
 
         return NFontCodeGen.generateFontsHeader( fonts )
 
-    def convertBitmaps(self, bitmaps, compress, backcolor, verbose):
+    def convertBitmaps(self, bitmaps, compress, backcolor, verbose, optimal=False,
+                       nformat='format16', band_rows=0, profile='flash', gamma=None,
+                       jobs=1, cache=None, dedup=True, dither='none', atlas=0,
+                       atlas_size=256, stream=0, stream_dir=None, anim=False,
+                       anim_delay=100, pixel_order='le', budget=0):
         """ Converting all parsed bitmaps to NGL_Bitmap objects
+            bitmaps - parsed bitmaps paths and objects
+            compress - type of compressing - 'None', 'RLE', 'JPG', 'Auto'
+            backcolor - background color for transparent input bitmap
+            verbose - increase output verbosity flag
+            optimal - use optimal (minimum size) RLE encoder
+            nformat - out data format 'format8', 'format16', 'format32'
+            band_rows - RLE rows bands with offsets table, 0 - not used
+            profile - AUTO compress cost model profile
+            gamma - alfa mixing gamma, None - as QPainter
+            jobs - bitmaps converting processes count, bitmaps order is
+            the same as parsed for any jobs count
+            cache - NBitmapsCache for converted bitmaps, None - not used
+            dedup - convert bitmaps with the same pixels once, objects of
+            all copies use the first bitmap
+            dither - reduced formats dithering 'none', 'ordered', 'fs'
+            atlas - pack bitmaps with width and height not more than
+            atlas to atlas images, 0 - not used
+            atlas_size - maximum atlas width and height
+            stream - convert not atlas bitmaps by strips of 'stream' rows
+            and save code to stream_dir while converting, cache not used,
+            0 - not used
+            anim - convert animated images and numbered images series
+            to NGL_Animation, see animFrames
+            anim_delay - numbered images series frame delay, ms
+            pixel_order - pixels words byte order 'le' (MCU order) or
+            'be' (SPI displays wire order)
+            budget - flash bytes for all bitmaps, codec and JPEG quality
+            of each not atlas and not animation bitmap chosen with minimum
+            total distortion, 0 - not used, compress for all bitmaps
         """
         ngl_bitmaps = []
 
+        if verbose and NBitmapCodecs.isAuto(compress[0]):
+            byte_weight, cycle_weight = NBitmapsConverter.profiles[profile]
+            inform(('AUTO cost model "{0}": cost = flash bytes * {1:g} + '
+                    'decode cycles * {2:g}').format(profile, byte_weight, cycle_weight))
+
+        params = (compress, backcolor, optimal, nformat, band_rows, profile, gamma, dither,
+                  pixel_order)
+
         for bmp in bitmaps:
-            b = self._convertBitmap(bmp, bitmaps[bmp], compress, backcolor, verbose)
+            self._checkBitmapPath(bmp)
+
+        # animations frames, detected before dedup to compare all frames
+        anims = {}
+        if anim:
+            for bmp in bitmaps:
+                frames, delays = self.animFrames(bmp, anim_delay)
+                if len(frames) > 1:
+                    anims[bmp] = (frames, delays)
+
+        duplicates = {}
+        if dedup:
+            bitmaps, duplicates = self.dedupBitmaps(bitmaps, files=bool(stream), anims=anims)
+
+        # animations, keyframe and frames changed rects bitmaps
+        animations = []
+        anim_bitmaps = {}
+        for bmp in [ bmp for bmp in bitmaps if bmp in anims ]:
+            frames, delays = anims[bmp]
+            anim_bitmaps[bmp] = self.animBitmap(bmp, frames, delays, bitmaps[bmp], params,
+                                                verbose)
+            animations += anim_bitmaps[bmp]
+            del bitmaps[bmp]
+
+        # small bitmaps packed to atlas images, region bitmaps point to atlas
+        atlases = []
+        regions = {}
+        if atlas:
+            small = [ bmp for bmp in bitmaps
+                      if max(QImageReader(bmp).size().width(),
+                             QImageReader(bmp).size().height()) <= atlas ]
+            if len(small) > 1:
+                atlases, regions = self.atlasBitmaps(small, bitmaps, params, atlas_size,
+                                                     verbose)
+                bitmaps = dict( (bmp, bitmaps[bmp]) for bmp in bitmaps if bmp not in regions )
+
+        # each bitmap params, flash budget chooses compress of each bitmap,
+        # atlases and animations bytes are out of budget for other bitmaps
+        bmp_params = dict( (bmp, params) for bmp in bitmaps )
+        if budget and bitmaps:
+            atlases_bytes = sum( NFlashBudget.bitmapSize(b) for b in atlases )
+            animations_bytes = sum( NFlashBudget.bitmapSize(b) for b in animations )
+            used = atlases_bytes + animations_bytes
+            if used > budget:
+                error(('flash budget %d bytes too small, atlases use %d bytes and animations '
+                       '%d bytes, no bytes left for other bitmaps :(') % (
+                      budget, atlases_bytes, animations_bytes))
+            if used:
+                inform('flash budget: atlases %d bytes, animations %d bytes, %d bytes left' % (
+                       atlases_bytes, animations_bytes, budget - used))
+            bmp_params = self.budgetParams(bitmaps, params, budget - used, jobs)
+
+        # cached bitmaps for not changed files and params
+        converted = {}
+        keys = {}
+        if stream:
+            cache = None
+        if cache is not None:
+            for bmp in bitmaps:
+                keys[bmp] = cache.key(bmp, bmp_params[bmp])
+                b = cache.get(keys[bmp])
+                if b is not None:
+                    converted[bmp] = b
+
+        misses = [bmp for bmp in bitmaps if bmp not in converted]
+
+        if stream:
+            if misses and compress[0].upper() not in ('NONE', 'RLE'):
+                inform('%s not available for stream converting, bitmaps compressed by RLE' % (
+                       compress[0]))
+
+            # code of streamed bitmaps saved by converter
+            args = [ (bmp, stream, stream_dir) + params for bmp in misses ]
+            if jobs > 1 and len(misses) > 1:
+                with ProcessPoolExecutor(max_workers=jobs) as pool:
+                    converted.update(zip(misses, pool.map(NUIC._streamBitmapFile, args)))
+            else:
+                converted.update(zip(misses, map(NUIC._streamBitmapFile, args)))
+        elif jobs > 1 and len(misses) > 1:
+            # each process loads own QImage, AUTO trials in the same process
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                converted.update(zip(misses, pool.map(NUIC._convertBitmapFile,
+                                                      [ (bmp,) + bmp_params[bmp] + (1,)
+                                                        for bmp in misses ])))
+        else:
+            # one bitmap with -j N, AUTO trials in processes pool
+            for bmp in misses:
+                converted[bmp] = NUIC._convertBitmapFile((bmp,) + bmp_params[bmp] + (jobs,))
+
+        if cache is not None:
+            for bmp in misses:
+                cache.put(keys[bmp], converted[bmp])
+
+        for bmp in bitmaps:
+            b = converted[bmp]
+            b.objects = bitmaps[bmp]
+            self._informBitmap(b, compress, verbose, bmp not in misses)
             ngl_bitmaps.append(b)
 
+        ngl_bitmaps += atlases + list(regions.values()) + animations
+
+        # flash saved by duplicates, data and colors table of each copy,
+        # atlas regions - not compressed region pixels, animations - all
+        # frames bitmaps
+        if duplicates:
+            converted.update(regions)
+            converted.update(anim_bitmaps)
+            saved = sum( len(duplicates[bmp]) * sum( b.data_len_in_bytes + len(b.clut) * 2 +
+                                                     (b.width * b.height * b.color_bit // 8
+                                                      if b.atlas else 0)
+                                                     for b in (converted[bmp]
+                                                               if bmp in anim_bitmaps
+                                                               else [converted[bmp]]) )
+                         for bmp in duplicates )
+            inform('bitmaps duplicates - %s, saved %d bytes' % (
+                   ', '.join('%s = %s' % (os.path.basename(bmp),
+                                          ', '.join(os.path.basename(d) for d in duplicates[bmp]))
+                             for bmp in duplicates), saved))
+
         return ngl_bitmaps
 
-    def _convertBitmap(self, path, objects, compress, backcolor, verbose):
-        """ Convert parsed bitmap to NGL_Bitmap object
-            path - path for input bitmap
-            compress - type of compressing - 'None', 'RLE', 'JPG', 'Auto'
-            backcolor - background color for transparent input bitmap
-            verbose - increase output verbosity flag
+    def atlasBitmaps(self, paths, bitmaps, params, atlas_size, verbose):
+        """ Pack bitmaps to atlas images and convert atlases, return
+            atlases NGL_Bitmap objects and dict of path to region NGL_Bitmap
+            with the same name, objects and size as bitmap
         """
-        if os.path.exists(path):
-
-            image = QImage(path)
-            name = os.path.basename(path).split('.')[0]
-
-            ngl_bitmap = NBitmapsConverter.convertQImage(image,
-                                                         name,
-                                                         'format16',
-                                                         compress,
-                                                         backcolor)
-            ngl_bitmap.objects = objects
+        images = [ QImage(bmp) for bmp in paths ]
+        atlas_images, places = NAtlas.build(images, atlas_size, atlas_size)
+
+        atlases = []
+        for index, image in enumerate(atlas_images):
+            a = NUIC._convertImage(image, 'ngl_atlas%d' % index, params, None)
+            a.objects = []
+            atlases.append(a)
+            self._informBitmap(a, params[0], verbose)
+
+        regions = {}
+        for bmp, image, (index, x, y) in zip(paths, images, places):
+            a = atlases[index]
+            name = os.path.basename(bmp).split('.')[0]
+
+            region = NGL_Bitmap(name, image.width(), image.height(), a.compressed)
+            region.atlas = a.name
+            region.region = (x, y)
+            region.color_bit = a.color_bit
+            region.data_word_size = a.data_word_size
+            region.datatype = a.datatype
+            region.data_len_in_words = 0
+            region.data_len_in_bytes = 0
+            region.objects = bitmaps[bmp]
+            regions[bmp] = region
 
             if verbose:
-                inform(('converting bitmap {name}, size {width}x{height}, '
-                        'compress {compress}, data len {size} bytes'
-                        ).format(name = name,
-                                 width = image.size().width(),
-                                 height = image.size().height(),
-                                 compress = ngl_bitmap.compressed,
-                                 size = ngl_bitmap.data_len_in_bytes))
-            return ngl_bitmap
+                inform('atlas region {0}, size {1}x{2}, in {3} at {4}, {5}'.format(
+                       name, image.width(), image.height(), a.name, x, y))
 
+        return atlases, regions
+
+    def budgetParams(self, bitmaps, params, budget, jobs=1):
+        """ Choose codec and JPEG quality of each bitmap for flash budget
+            in bytes, inform allocation, return dict of path to bitmap
+            convertBitmaps params
+        """
+        args = [ (bmp,) + params for bmp in bitmaps ]
+        if jobs > 1 and len(args) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                candidates = list(pool.map(NUIC._budgetCandidates, args))
         else:
+            candidates = list(map(NUIC._budgetCandidates, args))
+
+        choice = NFlashBudget.allocate(candidates, budget)
+        if choice is None:
+            error('flash budget %d bytes too small, bitmaps need at least %d bytes :(' % (
+                  budget, sum(min(c['bytes'] for c in cands) for cands in candidates)))
+
+        bmp_params = {}
+        total = 0
+        for bmp, cands, index in zip(bitmaps, candidates, choice):
+            c = cands[index]
+            bmp_params[bmp] = ((c['codec'], c['quality']),) + params[1:]
+            total += c['bytes']
+
+            inform(('flash budget {name}: {codec}{q}, {bytes} bytes, PSNR {psnr:.1f} dB, '
+                    'SSIM {ssim:.4f}').format(name = os.path.basename(bmp),
+                                               q = '' if NBitmapCodecs.get(c['codec']).lossless
+                                                   else ' quality %d' % c['quality'],
+                                               **c))
+
+        inform('flash budget: %d of %d bytes used' % (total, budget))
+
+        return bmp_params
+
+    @staticmethod
+    def _budgetCandidates(args):
+        """ flash budget candidates of bitmap file, args - path and
+            convertBitmaps params """
+        path = args[0]
+        compress, backcolor, optimal, nformat, band_rows, profile, gamma, dither, order = args[1:]
+        name = os.path.basename(path).split('.')[0]
+
+        # AUTO+LZSS also tries LZSS
+        codecs = None
+        if NBitmapCodecs.isAuto(compress[0]):
+            codecs = NBitmapCodecs.select(compress[0])
+
+        return NFlashBudget.candidates(QImage(path), name, nformat, backcolor, optimal,
+                                       band_rows, profile, gamma, dither, order,
+                                       codecs = codecs)
+
+    def animFrames(self, path, delay):
+        """ Animation frames QImages and delays in ms, frames of animated
+            image (GIF) or numbered images series from path (frame_00.png,
+            frame_01.png, ...), one frame if path is not animation
+        """
+        reader = QImageReader(path)
+        if reader.imageCount() > 1:
+            frames, delays = [], []
+            for _ in range(reader.imageCount()):
+                frames.append(reader.read())
+                delays.append(reader.nextImageDelay())
+            return frames, delays
+
+        # numbered series, the same name prefix, digits count and extension
+        dirname, filename = os.path.split(path)
+        match = re.match(r'^(.*_)(\d+)(\.[^.]*)$', filename)
+        if match is None:
+            return [QImage(path)], [delay]
+
+        prefix, number, ext = match.groups()
+        paths = []
+        index = int(number)
+        while True:
+            frame = os.path.join(dirname, '%s%0*d%s' % (prefix, len(number), index, ext))
+            if not os.path.exists(frame):
+                break
+            paths.append(frame)
+            index += 1
+
+        return [ QImage(frame) for frame in paths ], [delay] * len(paths)
+
+    def animBitmap(self, path, frames, delays, objects, params, verbose):
+        """ Convert animation frames, return keyframe NGL_Bitmap with
+            objects and frames changed rects NGL_Bitmaps
+        """
+        compress, backcolor, optimal, nformat, band_rows, profile, gamma, dither, order = params
+        name = os.path.basename(path).split('.')[0]
+
+        bitmaps = NBitmapsConverter.convertFrames(frames, delays, name, nformat, compress,
+                                                  backcolor, optimal, band_rows, profile,
+                                                  gamma, None, dither, order)
+        for b in bitmaps:
+            b.objects = []
+            self._informBitmap(b, compress, verbose)
+        bitmaps[0].objects = objects
+
+        if verbose:
+            inform('animation {0}, {1} frames, {2} changed rects, data len {3} bytes'.format(
+                   name, len(frames), len(bitmaps) - 1,
+                   sum(b.data_len_in_bytes for b in bitmaps)))
+
+        return bitmaps
+
+    def dedupBitmaps(self, bitmaps, files=False, anims=None):
+        """ Merge bitmaps with the same pixels (size and ARGB data, other
+            conversion settings are common for all bitmaps), return
+            unique bitmaps with objects of all copies and dict of first
+            bitmap path to copies paths, files - compare files bytes,
+            images not loaded, anims - dict of animations paths to frames
+            and delays, animations compared by all frames and delays
+        """
+        unique = {}
+        duplicates = {}
+        firsts = {}
+        anims = anims or {}
+
+        for bmp in bitmaps:
+            if bmp in anims:
+                frames, delays = anims[bmp]
+                key = ('anim', tuple(delays)) + tuple(
+                      (f.width(), f.height(),
+                       hashlib.sha256(NBitmapsConverter.imageARGB(f).tobytes()).hexdigest())
+                      for f in frames)
+            elif files:
+                sha = hashlib.sha256()
+                with open(bmp, 'rb') as f:
+                    for chunk in iter(lambda: f.read(0x10000), b''):
+                        sha.update(chunk)
+                key = sha.hexdigest()
+            else:
+                image = QImage(bmp)
+                argb = NBitmapsConverter.imageARGB(image)
+                key = (image.width(), image.height(), hashlib.sha256(argb.tobytes()).hexdigest())
+
+            if key in firsts:
+                first = firsts[key]
+                unique[first] = unique[first] + bitmaps[bmp]
+                duplicates.setdefault(first, []).append(bmp)
+            else:
+                firsts[key] = bmp
+                unique[bmp] = list(bitmaps[bmp])
+
+        return unique, duplicates
+
+    @staticmethod
+    def _convertBitmapFile(args):
+        """ load and convert bitmap file, args - path, convertBitmaps
+            params and AUTO trials processes count """
+        path, params, workers = args[0], args[1:-1], args[-1]
+
+        image = QImage(path)
+        name = os.path.basename(path).split('.')[0]
+
+        return NUIC._convertImage(image, name, params, workers)
+
+    @staticmethod
+    def _streamBitmapFile(args):
+        """ convert bitmap file by strips and save code, args - path,
+            strip rows, code dir and convertBitmaps params """
+        path, strip_rows, code_dir = args[:3]
+        compress, backcolor, optimal, nformat, band_rows, profile, gamma, dither, order = args[3:]
+        name = os.path.basename(path).split('.')[0]
+
+        # the same file as saveResources
+        with open(os.path.join(code_dir, name.replace(' ', '_') + '.c'), 'w') as f:
+            return NBitmapsConverter.convertStream(path, name, nformat, compress, backcolor,
+                                                   f, strip_rows, optimal, band_rows, gamma,
+                                                   dither, order)
+
+    @staticmethod
+    def _convertImage(image, name, params, workers):
+        """ convert QImage, params - convertBitmaps params tuple """
+        compress, backcolor, optimal, nformat, band_rows, profile, gamma, dither, order = params
+
+        return NBitmapsConverter.convertQImage(image,
+                                               name,
+                                               nformat,
+                                               compress,
+                                               backcolor,
+                                               optimal,
+                                               band_rows,
+                                               profile,
+                                               gamma,
+                                               workers,
+                                               dither,
+                                               order)
+
+    def _checkBitmapPath(self, path):
+        if not os.path.exists(path):
             error(('File "{0}" not found! Expected path - "{1}" not exist'
-                   ' :( :( :( ').format(bitmap['name'], bitmap['path']))
+                   ' :( :( :( ').format(os.path.basename(path), path))
+
+    def _informBitmap(self, ngl_bitmap, compress, verbose, cached=False):
+        if verbose:
+            inform(('{action} bitmap {name}, size {width}x{height}, '
+                    'compress {compress}, data len {size} bytes'
+                    ).format(action = 'cached' if cached else 'converting',
+                             name = ngl_bitmap.name,
+                             width = ngl_bitmap.width,
+                             height = ngl_bitmap.height,
+                             compress = ngl_bitmap.compressed,
+                             size = ngl_bitmap.data_len_in_bytes))
+
+            # streamed bitmaps not use AUTO trials, cost not set
+            if NBitmapCodecs.isAuto(compress[0]) and ngl_bitmap.cost is not None:
+                inform(('\t{codec}: {bytes} bytes, ~{cycles} decode cycles, '
+                        'cost {cost:.0f}').format(**ngl_bitmap.cost))
+
+    def rleReport(self, bitmaps, backcolor, nformat='format16', gamma=None, dither='none',
+                  pixel_order='le'):
+        """ Inform greedy and optimal RLE sizes for all parsed bitmaps,
+            pixels words in nformat as converted
+        """
+        total_greedy = 0
+        total_optimal = 0
+
+        for path in bitmaps:
+            if not os.path.exists(path):
+                continue
+
+            pixels, width = NBitmapsConverter.sourceWords(QImage(path), nformat, backcolor,
+                                                          gamma, dither, pixel_order)
+            report = rlem_report(pixels, width)
+
+            total_greedy += report['greedy'] * width // 8
+            total_optimal += report['optimal'] * width // 8
+
+            inform(('rle {name}: {words} {width}-bit words, greedy {greedy}, '
+                    'optimal {optimal}, saved {saved} words'
+                    ).format(name = os.path.basename(path), width = width, **report))
+
+        inform(('rle total: greedy {0}, optimal {1}, saved {2} bytes'
+                ).format(total_greedy, total_optimal, total_greedy - total_optimal))
+
+    def packBitmaps(self, bitmaps, pack_name, align, base, verbose):
+        """ Move bitmaps data to resource pack, bitmaps code point to
+            data address in pack, return NResourcePack
+        """
+        pack = NResourcePack(align, base)
+        packed = [ bmp for bmp in bitmaps if not bmp.atlas and bmp.data_len_in_bytes ]
+
+        # index size depends on entries count, addresses set after all added
+        for bmp in packed:
+            try:
+                pack.add(bmp.name, NResourcePack.payload(bmp.data, bmp.data_word_size))
+            except ValueError as e:
+                error('%s :( exit...' % e)
+
+        for bmp, address in zip(packed, pack.addresses()):
+            bmp.pack = pack_name
+            bmp.pack_address = address
+
+            if verbose:
+                inform('pack bitmap %s, address 0x%x, data len %d bytes' % (
+                       bmp.name, bmp.pack_address, bmp.data_len_in_bytes))
+
+        if verbose:
+            inform('resource pack %s - %d bitmaps, %d bytes' % (
+                   pack_name, len(pack.entries), pack.size()))
+
+        return pack
 
     def bitmapsHeaderCode(self, bitmaps, verbose ):
         if verbose:
@@ -130,6 +564,42 @@ class NUIC(object):
 
         return NBitmapCodeGen.generateBitmapsHeader(bitmaps)
 
+    def bitmapsTypesCode(self, bitmaps, verbose):
+        """ Generate bitmaps types header code, None if bitmaps use
+            NGL_Image only
+        """
+        code = NBitmapCodeGen.generateImageTypesHeader(bitmaps)
+        if code is not None and verbose:
+            inform('generate bitmaps types header file...')
+
+        return code
+
+    def bitmapsDecodersCode(self, bitmaps, verbose):
+        """ Generate decoders code for codecs and data words widths
+            used by compressed bitmaps, codecs with fixed data width
+            (LZSS bytes) have one decoder for all pixels widths
+        """
+        decoders = {}
+
+        for bmp in bitmaps:
+            codec = NBitmapCodecs.get(bmp.compressed)
+            width = bmp.data_word_size
+            if codec.data_width:
+                key = 'ngl_%s_decode' % codec.name.lower()
+                words = '%s-bit data' % codec.data_width
+            else:
+                key = 'ngl_%s%s_decode' % (codec.name.lower(), width)
+                words = '%s-bit' % width
+
+            if codec.decoder is None or key in decoders:
+                continue
+
+            if verbose:
+                inform('generate %s %s decoder...' % (codec.name, words))
+            decoders[key] = NBitmapCodeGen.decoder(codec, width)
+
+        return decoders
+
 
     def informUser(self, state, verbose):
         if state == 'parse_end':
@@ -230,11 +700,43 @@ class NUIC(object):
                       code = kwargs['bitmapsheader'],
                       verbose = kwargs['verbose'])
 
+        # bitmaps types header
+        if kwargs.get('typesheader'):
+            self.saveCode(dircode = 'bitmaps',
+                          name = NBitmapCodeGen.types_header,
+                          code = kwargs['typesheader'],
+                          verbose = kwargs['verbose'])
+
+        # bitmaps decoders
+        if 'decoderscode' in kwargs:
+            for key in kwargs['decoderscode']:
+                self.saveCode(dircode = 'bitmaps',
+                              name = '%s.c' % key,
+                              code = kwargs['decoderscode'][key],
+                              verbose = kwargs['verbose'])
+
         # all fonts resourses
         self.saveResources(kwargs['fonts'], 'fonts', kwargs['verbose'])
 
         # all bitmaps resourses
-        self.saveResources(kwargs['bitmaps'], 'bitmaps', kwargs['verbose'])
+        self.saveBitmaps(kwargs['bitmaps'], kwargs['verbose'])
+
+    def savePack(self, pack, name, bitmaps, verbose):
+        """ Save resource pack to bitmaps dir and verify saved file with
+            bitmaps data addresses
+        """
+        _file = os.path.abspath( os.path.join( self.dirs['bitmaps'], name ) )
+        pack.write( _file )
+
+        addresses = dict( (bmp.name, bmp.pack_address) for bmp in bitmaps
+                          if bmp.pack_address is not None )
+        bad = pack.verify( _file, addresses )
+        if bad:
+            error( 'resource pack "%s" verify failed for %s :( exit...' % (
+                   _file, ', '.join(bad)) )
+
+        if verbose:
+            inform( 'saved [ %s ], path -- %s' % ( name, _file ) )
 
     def saveCode(self, **kwargs):
         # page = self.parser.parsedPage()
@@ -254,6 +756,19 @@ class NUIC(object):
             if verbose:
                 inform( 'saved [ %s ], path -- %s' % (obj.name, _file) )
 
+    def saveBitmaps(self, bitmaps, verbose):
+        """ Save bitmaps code, data lines written to file by parts,
+            streamed bitmaps code saved while converting
+        """
+        for bmp in bitmaps:
+            if bmp.saved:
+                continue
+            _file = os.path.abspath( os.path.join( self.dirs['bitmaps'], bmp.name + '.c' ) )
+            with open( _file, 'w' ) as f:
+                bmp.writeCode( f )
+            if verbose:
+                inform( 'saved [ %s ], path -- %s' % (bmp.name, _file) )
+
     def _write(self, sfile, mode, data):
         with open(sfile, mode) as f:
             f.write(data)
@@ -290,7 +805,9 @@ def createArgParser():
                             default = 'AUTO',
                             metavar = 'C',
                             help = ( '\t compress for bitmaps, available options - '
-                                     '{ NONE, RLE, JPG, AUTO(minimum size) } '
+                                     '{ NONE, RLE, JPG, LZSS, AUTO(minimum size), '
+                                     'AUTO+LZSS (AUTO also tries LZSS) }, LZSS needs '
+                                     'generated ngl_lzss_decode.c in firmware '
                                      '[default: \'AUTO\']' ) )
 
     parser.add_argument( '--bmp-jpg', dest = 'bitmap_jpeg_quality', type = int,
@@ -299,6 +816,154 @@ def createArgParser():
                             help = ( '\t bitmaps JPG compression quality, available 0 - 100 '
                                      '[default: 100]' ) )
 
+    parser.add_argument( '--bmp-format', dest = 'bitmap_format', type = str,
+                            default = 'format16',
+                            metavar = 'F',
+                            choices = [ 'format8', 'format16', 'format32',
+                                        'indexed', 'indexed1', 'indexed2',
+                                        'indexed4', 'indexed8', 'gray4', 'mono' ],
+                            help = ( '\t bitmaps data format, available options - '
+                                     '{ format8 (RGB332), format16 (RGB565), '
+                                     'format32 (RGB888), gray4 (4 bits gray), mono '
+                                     '(1 bit), indexed1/2/4/8 (N bits '
+                                     'colors indexes + RGB565 colors table), indexed '
+                                     '(minimum indexes bits) }, indexed bitmaps type '
+                                     'NGL_IndexedImage in generated ngl_image_types.h, '
+                                     'NGL.h v1.0 draws NGL_Image only '
+                                     '[default: \'format16\']' ) )
+
+    parser.add_argument( '--bmp-dither', dest = 'bitmap_dither', type = str,
+                            default = 'none',
+                            metavar = 'D',
+                            choices = [ 'none', 'ordered', 'fs' ],
+                            help = ( '\t dithering for format8, format16, gray4 and mono '
+                                     'formats, available options - { none, ordered '
+                                     '(Bayer 8x8), fs (Floyd-Steinberg) } '
+                                     '[default: \'none\']' ) )
+
+    parser.add_argument( '--pixel-order', dest = 'pixel_order', type = str,
+                            default = 'le',
+                            choices = NBitmapsConverter.pixel_orders,
+                            help = ( '\t bitmaps pixels words byte order, le - MCU order, '
+                                     'be - big endian wire order of SPI displays '
+                                     '(ILI9341, ST7789), data sent to display without '
+                                     'swap [default: le]' ) )
+
+    parser.add_argument( '--bmp-profile', dest = 'bitmap_profile', type = str,
+                            default = 'flash',
+                            metavar = 'P',
+                            choices = [ 'flash', 'balanced', 'fps' ],
+                            help = ( '\t AUTO compress cost model, flash bytes vs '
+                                     'estimated decode cycles, available options - '
+                                     '{ flash, balanced, fps } [default: \'flash\']' ) )
+
+    parser.add_argument( '--bmp-gamma', dest = 'bitmap_gamma', type = float,
+                            default = None,
+                            metavar = 'G',
+                            help = ( '\t mix transparent pixels with background in '
+                                     'linear light with gamma G (2.2 for sRGB), '
+                                     'not set - as QPainter [default: None]' ) )
+
+    parser.add_argument( '--flash-budget', dest = 'flash_budget', type = int,
+                            default = 0,
+                            metavar = 'BYTES',
+                            help = ( '\t flash bytes for all bitmaps data, codec and JPEG '
+                                     'quality of each bitmap chosen with minimum distortion, '
+                                     'overrides --bmp-cmprs and --bmp-jpg (AUTO+LZSS also '
+                                     'tries LZSS), 0 - not used '
+                                     '[default: 0]' ) )
+
+    parser.add_argument( '--rle-optimal', dest = 'rle_optimal', action='store_true',
+                            default = False,
+                            help = ( '\t use optimal (minimum size) RLE blocks split, '
+                                     'also for AUTO compress [default: \'False\']' ) )
+
+    parser.add_argument( '--rle-rows', dest = 'rle_band_rows', type = int,
+                            default = 0,
+                            metavar = 'N',
+                            help = ( '\t encode RLE bitmaps by N rows independent bands '
+                                     'with bands offsets table for partial redraw, '
+                                     'table type NGL_ImageRows in generated '
+                                     'ngl_image_types.h, 0 - not used [default: 0]' ) )
+
+    parser.add_argument( '--rle-report', dest = 'rle_report', action='store_true',
+                            default = False,
+                            help = ( '\t report greedy vs optimal RLE size for '
+                                     'all bitmaps [default: \'False\']' ) )
+
+    parser.add_argument( '--atlas', dest = 'atlas', type = int,
+                            default = 0,
+                            metavar = 'S',
+                            help = ( '\t pack bitmaps not larger than SxS pixels to '
+                                     'atlas images, widgets use atlas regions, '
+                                     'region type NGL_ImageRegion in generated '
+                                     'ngl_image_types.h, NGL.h v1.0 draws NGL_Image '
+                                     'only, 0 - not used [default: 0]' ) )
+
+    parser.add_argument( '--atlas-size', dest = 'atlas_size', type = int,
+                            default = 256,
+                            metavar = 'N',
+                            help = ( '\t maximum atlas image width and height '
+                                     '[default: 256]' ) )
+
+    parser.add_argument( '--res-pack', dest = 'res_pack', type = str,
+                            default = None,
+                            metavar = 'FILE',
+                            help = ( '\t save bitmaps data to FILE binary resource pack in bitmaps dir '
+                                     'for external flash, bitmaps point to data address '
+                                     'in pack [default: not used]' ) )
+
+    parser.add_argument( '--pack-align', dest = 'pack_align', type = int,
+                            default = 4,
+                            metavar = 'N',
+                            help = ( '\t resource pack data align in bytes, power of 2 '
+                                     '[default: 4]' ) )
+
+    parser.add_argument( '--pack-base', dest = 'pack_base', type = lambda x: int(x, 0),
+                            default = 0,
+                            metavar = 'ADDR',
+                            help = ( '\t resource pack address in external flash, added '
+                                     'to bitmaps data offsets [default: 0]' ) )
+
+    parser.add_argument( '--stream-rows', dest = 'stream_rows', type = int,
+                            default = 0,
+                            metavar = 'N',
+                            help = ( '\t convert bitmaps by strips of N rows and save '
+                                     'code while converting, for very large bitmaps, '
+                                     'not compressed or RLE data only, '
+                                     '0 - not used [default: 0]' ) )
+
+    parser.add_argument( '--anim', dest = 'anim', action='store_true',
+                            default = False,
+                            help = ( '\t convert animated images (GIF) and numbered images '
+                                     'series (name_00.png, name_01.png ...) to keyframe and '
+                                     'frames changed rects, types NGL_Animation and '
+                                     'NGL_AnimationFrame in generated ngl_image_types.h '
+                                     '[default: \'False\']' ) )
+
+    parser.add_argument( '--anim-delay', dest = 'anim_delay', type = int,
+                            default = 100,
+                            metavar = 'MS',
+                            help = ( '\t numbered images series frame delay in ms '
+                                     '[default: 100]' ) )
+
+    parser.add_argument( '--no-cache', dest = 'no_cache', action='store_true',
+                            default = False,
+                            help = ( '\t convert all bitmaps, not use converted bitmaps '
+                                     'cache [default: \'False\']' ) )
+
+    parser.add_argument( '--cache-dir', dest = 'cache_dir', type = str,
+                            default = None,
+                            metavar = 'D',
+                            help = ( '\t converted bitmaps cache directory '
+                                     '[default: ~/.cache/ngl_utils/bitmaps]' ) )
+
+    parser.add_argument( '-j', '--jobs', dest = 'jobs', type = int,
+                            default = 1,
+                            metavar = 'N',
+                            help = ( '\t convert bitmaps in N processes '
+                                     '[default: 1]' ) )
+
     parser.add_argument( '-v', '--verbose', action='store_true', default = False,
                             help = ( '\t increase output verbosity '
                                      '[default: \'False\']') )
@@ -337,9 +1002,44 @@ def main():
     ngl_fonts = nuic.convertFonts( ppage['fonts'], verbose )
     ngl_fonts_header = nuic.fontsHeaderCode( ngl_fonts, verbose )
 
+    # greedy vs optimal RLE sizes report
+    if args.rle_report:
+        nuic.rleReport( ppage['bitmaps'], ppage['background_color'], args.bitmap_format,
+                        args.bitmap_gamma, args.bitmap_dither, args.pixel_order )
+
+    # streamed bitmaps code saved while converting
+    stream_dir = None
+    if args.stream_rows:
+        if args.res_pack:
+            error( 'resource pack not available for streamed bitmaps :( exit...' )
+        if args.flash_budget:
+            error( 'flash budget not available for streamed bitmaps :( exit...' )
+        stream_dir = nuic.createDirs( basepath=outdir, pagename=ppage['name'] )['bitmaps']
+
     # convert all bitmaps, generate common bitmaps header code
-    ngl_bitmaps = nuic.convertBitmaps( ppage['bitmaps'], bitmap_compress, ppage['background_color'], verbose )
+    cache = None if args.no_cache else NBitmapsCache( args.cache_dir )
+    ngl_bitmaps = nuic.convertBitmaps( ppage['bitmaps'], bitmap_compress, ppage['background_color'],
+                                       verbose, args.rle_optimal, args.bitmap_format,
+                                       args.rle_band_rows, args.bitmap_profile,
+                                       args.bitmap_gamma, args.jobs, cache,
+                                       dither = args.bitmap_dither,
+                                       atlas = args.atlas,
+                                       atlas_size = args.atlas_size,
+                                       stream = args.stream_rows,
+                                       stream_dir = stream_dir,
+                                       anim = args.anim,
+                                       anim_delay = args.anim_delay,
+                                       pixel_order = args.pixel_order,
+                                       budget = args.flash_budget )
+
+    # move bitmaps data to resource pack for external flash
+    if args.res_pack:
+        pack = nuic.packBitmaps( ngl_bitmaps, os.path.basename( args.res_pack ),
+                                 args.pack_align, args.pack_base, verbose )
+
     ngl_bitmaps_header = nuic.bitmapsHeaderCode( ngl_bitmaps, verbose )
+    ngl_types_header = nuic.bitmapsTypesCode( ngl_bitmaps, verbose )
+    ngl_decoders = nuic.bitmapsDecodersCode( ngl_bitmaps, verbose )
 
     # generate page and objects code
     pagecode = nuic.pageCode( ppage, ngl_bitmaps, ngl_fonts, verbose )
@@ -360,10 +1060,15 @@ def main():
                 headerscode = headerscode,
                 bitmaps = ngl_bitmaps,
                 bitmapsheader = ngl_bitmaps_header,
+                typesheader = ngl_types_header,
+                decoderscode = ngl_decoders,
                 fonts = ngl_fonts,
                 fontsheader = ngl_fonts_header,
                 verbose = verbose )
 
+    if args.res_pack:
+        nuic.savePack( pack, os.path.basename( args.res_pack ), ngl_bitmaps, verbose )
+
     # final
     app.exit()
     inform( '-*-*- All works finish! :) --- out code locate in %s' % os.path.abspath(code_dirs['base']) )
@@ -63,6 +63,21 @@ class NGL_Colors(object):
 
         return (R | G | B)
 
+    @staticmethod
+    def fromARGB332(argb_data):
+        """ convert 8888_ARGB to 332_RGB """
+
+        R = ((argb_data & 0xE00000) >> 16)
+        G = ((argb_data & 0xE000) >> 11)
+        B = (argb_data & 0xC0) >> 6
+
+        return (R | G | B)
+
+    @staticmethod
+    def fromARGB888(argb_data):
+        """ convert 8888_ARGB to 888_RGB """
+        return argb_data & 0xFFFFFF
+
     @staticmethod
     def fromRGB(rgb):
         """ convert 888_RGB to 565_RGB """
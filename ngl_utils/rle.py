@@ -1,91 +1,459 @@
 #!/usr/bin/env python3
 
+from array import array
+from collections import deque
+import numpy as np
+
+# array typecodes for encoded words width
+RLEM_TYPECODES = { 8: 'B', 16: 'H', 32: 'L' if array('L').itemsize == 4 else 'I' }
+
 # ------------------------------------------------------------------------------
 # rlem_encode
 # ------------------------------------------------------------------------------
-def rlem_encode(data):
+def rlem_encode(data, optimal=False, width=16):
+    """ RLEm encode list of 16-bit words, vectorized version of
+        rlem_encode_reference, output words stream is identical.
+        optimal - find blocks with minimum out words count (dynamic
+        programming), stream format is the same, decoder not changed.
+        width - encoded words width 8, 16 or 32 bits.
+
+        Encoded stream is sequence of blocks:
+            count, word                 - run of 'count' equal words
+            0x8000 | count, words...    - 'count' literal words
+        the last three words always go to the trailing literal block
+        (not in optimal mode). Flag is the high bit of word width and
+        blocks longer than flag - 1 words are split to several blocks.
+    """
+    words = np.asarray(data, dtype=np.int64).ravel()
+    max_count = _rlem_flag(width) - 1
+
+    if optimal:
+        blocks = _rlem_optimal_blocks(words, max_count)
+    else:
+        blocks = _rlem_greedy_blocks(words)
+
+    blocks = _rlem_split(*blocks, max_count)
+    return _rlem_assemble(words, *blocks, width)
+
+# ------------------------------------------------------------------------------
+# rlem_encode_bands
+# ------------------------------------------------------------------------------
+def rlem_encode_bands(data, band_words, optimal=False, width=16):
+    """ RLEm encode data by bands of 'band_words' words (rows band), each
+        band is independent RLEm stream, so decoder may start from any band.
+        Return encoded words and list of bands start offsets in encoded
+        words, whole encoded data decodes as usual RLEm stream.
+    """
+    words = np.asarray(data, dtype=np.int64).ravel()
+    out = []
+    offsets = []
+
+    for start in range(0, len(words), band_words):
+        offsets.append(len(out))
+        out.extend(rlem_encode(words[start:start + band_words], optimal, width))
+
+    return out, offsets
+
+# ------------------------------------------------------------------------------
+# rlem_report
+# ------------------------------------------------------------------------------
+def rlem_report(data, width=16):
+    """ compare greedy and optimal RLEm encoded sizes for data,
+        return dict with words count for each and saved words """
+    greedy = len(rlem_encode(data, width=width))
+    optimal = len(rlem_encode(data, optimal=True, width=width))
+
+    return { 'words': len(data),
+             'greedy': greedy,
+             'optimal': optimal,
+             'saved': greedy - optimal }
+
+# ------------------------------------------------------------------------------
+# _rlem_flag
+# ------------------------------------------------------------------------------
+def _rlem_flag(width):
+    """ literal block flag for encoded words width """
+    if width not in RLEM_TYPECODES:
+        raise ValueError('RLEm words width must be 8, 16 or 32 bits')
+    return 1 << (width - 1)
+
+# ------------------------------------------------------------------------------
+# _rlem_groups
+# ------------------------------------------------------------------------------
+def _rlem_groups(words):
+    """ groups of equal words, return start index and last index for each """
+    starts = np.concatenate(([0], np.flatnonzero(words[1:] != words[:-1]) + 1))
+    ends = np.append(starts[1:] - 1, len(words) - 1)
+    return starts, ends
+
+# ------------------------------------------------------------------------------
+# _rlem_greedy_blocks
+# ------------------------------------------------------------------------------
+def _rlem_greedy_blocks(words):
+    """ blocks as rlem_encode_reference state machine split the words,
+        return blocks start indexes, lengths and run flags """
+    data_len = len(words)
+
+    # short data, all words to one literal block
+    if data_len < 4:
+        return np.array([0]), np.array([data_len]), np.array([False])
+
+    # words [0, body) are split to runs and literals, [body, data_len) - tail
+    body = data_len - 3
+    starts, ends = _rlem_groups(words)
+
+    # run is any group longer than one word starts in body, cropped by body
+    runs = (starts < body) & (ends > starts)
+    run_starts = starts[runs]
+    run_ends = np.minimum(ends[runs], body - 1)
+
+    # literals is gaps between runs in body, plus tail literal
+    lit_starts = np.concatenate(([0], run_ends + 1))
+    lit_ends = np.append(run_starts, body)
+    gaps = lit_ends > lit_starts
+    lit_starts = np.append(lit_starts[gaps], body)
+    lit_ends = np.append(lit_ends[gaps], data_len)
+
+    # all blocks ordered by start index
+    blk_starts = np.concatenate((run_starts, lit_starts))
+    blk_lens = np.concatenate((run_ends + 1 - run_starts, lit_ends - lit_starts))
+    blk_runs = np.concatenate((np.ones(len(run_starts), dtype=bool),
+                               np.zeros(len(lit_starts), dtype=bool)))
+    order = np.argsort(blk_starts, kind='stable')
+
+    return blk_starts[order], blk_lens[order], blk_runs[order]
+
+# ------------------------------------------------------------------------------
+# _rlem_optimal_blocks
+# ------------------------------------------------------------------------------
+def _rlem_optimal_blocks(words, max_count):
+    """ blocks with minimum encoded words count, each equal words group is
+        run (2 words for each max_count words) or part of literal (1 word
+        per word, and 1 header word for each max_count words of literal
+        block), return blocks as _rlem_greedy_blocks """
+    if not len(words):
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=bool)
+
+    starts, ends = _rlem_groups(words)
+    counts = (ends + 1 - starts).tolist()
+    groups_cnt = len(counts)
+
+    # cost for groups before current, last block closed run or open
+    # literal, open literal fill - words in it last max_count words part.
+    # Open literals with less cost or the same cost and less fill are
+    # never worse, further headers differ not more than by one
+    closed, opened, fill = 0, float('inf'), 0
+    # back track, run after open literal; literal extend open
+    from_open = bytearray(groups_cnt)
+    lit_extend = bytearray(groups_cnt)
+
+    for k, count in enumerate(counts):
+        from_open[k] = opened < closed
+
+        # new literal after run or extend open literal
+        new = (closed + count + -(-count // max_count), (count - 1) % max_count + 1)
+        extend = (opened + count + -(-(fill + count) // max_count) - 1,
+                  (fill + count - 1) % max_count + 1)
+
+        if extend <= new:
+            lit_extend[k] = 1
+            new_opened, fill = extend
+        else:
+            new_opened, fill = new
+
+        closed, opened = min(closed, opened) + 2 * -(-count // max_count), new_opened
+
+    # back track choices, each group to run or literal
+    group_runs = np.zeros(groups_cnt, dtype=bool)
+    in_literal = opened < closed
+    for k in range(groups_cnt - 1, -1, -1):
+        if in_literal:
+            in_literal = bool(lit_extend[k])
+        else:
+            group_runs[k] = True
+            in_literal = bool(from_open[k])
+
+    # literal block starts from literal group after run group or first
+    new_literal = ~group_runs & np.concatenate(([True], group_runs[:-1]))
+    blk_first = group_runs | new_literal
+    blk_groups = np.flatnonzero(blk_first)
+
+    blk_starts = starts[blk_groups]
+    blk_lens = np.diff(np.append(blk_starts, len(words)))
+
+    return blk_starts, blk_lens, group_runs[blk_groups]
+
+# ------------------------------------------------------------------------------
+# _rlem_split
+# ------------------------------------------------------------------------------
+def _rlem_split(blk_starts, blk_lens, blk_runs, max_count):
+    """ split blocks longer than max_count words """
+    parts = -(-blk_lens // max_count)
+    if not len(parts) or parts.max() <= 1:
+        return blk_starts, blk_lens, blk_runs
+
+    # part index inside each block
+    part_index = np.arange(int(parts.sum())) - np.repeat(np.cumsum(parts) - parts, parts)
+    part_offsets = part_index * max_count
+
+    starts = np.repeat(blk_starts, parts) + part_offsets
+    lens = np.minimum(np.repeat(blk_lens, parts) - part_offsets, max_count)
+
+    return starts, lens, np.repeat(blk_runs, parts)
+
+# ------------------------------------------------------------------------------
+# _rlem_assemble
+# ------------------------------------------------------------------------------
+def _rlem_assemble(words, blk_starts, blk_lens, blk_runs, width=16):
+    """ assemble RLEm words stream from blocks """
+    flag = _rlem_flag(width)
+    data_len = len(words)
+
+    # out offset for each block, run - 2 words, literal - header and words
+    out_lens = np.where(blk_runs, 2, blk_lens + 1)
+    out_offsets = np.cumsum(out_lens) - out_lens
+    out = np.empty(int(out_lens.sum()), dtype=np.int64)
+
+    # blocks headers and runs words
+    out[out_offsets] = np.where(blk_runs, blk_lens, flag | blk_lens)
+    out[out_offsets[blk_runs] + 1] = words[blk_starts[blk_runs]]
+
+    # literals words, each input word index maps to it block
+    blk_index = np.repeat(np.arange(len(blk_starts)), blk_lens)
+    literal = ~blk_runs[blk_index]
+    index = np.arange(data_len)
+    pos = out_offsets[blk_index] + 1 + index - blk_starts[blk_index]
+    out[pos[literal]] = words[literal]
+
+    return out.tolist()
+
+# ------------------------------------------------------------------------------
+# rlem_encode_stream
+# ------------------------------------------------------------------------------
+def rlem_encode_stream(chunks, width=16):
+    """ RLEm encode chunked iterable of 16-bit words (image rows, arrays),
+        generator yields encoded words, stream is identical to rlem_encode.
+        Only current run, not full literal block and three words lookahead
+        stay in memory, groups closed inside each chunk are found by NumPy.
+    """
+    flag = _rlem_flag(width)
+    pending = deque()   # closed groups [word, count], not followed by 3 words
+    pending_len = 0     # words in pending groups
+    group = None        # current open group [word, count]
+    literal = []        # literal buffer
+    data_len = 0
+
+    for chunk in chunks:
+        words = np.asarray(chunk, dtype=np.int64).ravel()
+        if not len(words):
+            continue
+        data_len += len(words)
+
+        # equal words groups inside chunk
+        starts = np.concatenate(([0], np.flatnonzero(words[1:] != words[:-1]) + 1))
+        counts = np.diff(np.append(starts, len(words)))
+
+        for word, count in zip(words[starts].tolist(), counts.tolist()):
+            if group is not None and group[0] == word:
+                group[1] += count
+                continue
+
+            if group is not None:
+                pending.append(group)
+                pending_len += group[1]
+            group = [word, count]
+
+            # group followed by 3 words never touch tail, encode it
+            while pending and pending_len - pending[0][1] + group[1] >= 3:
+                word0, count0 = pending.popleft()
+                pending_len -= count0
+                if count0 > 1:
+                    yield from _rlem_literal_words(literal, flag)
+                    yield from _rlem_run_words(word0, count0, flag)
+                    literal = []
+                else:
+                    literal.append(word0)
+
+                    # full literal block, rlem_encode splits at the same word
+                    if len(literal) == flag - 1:
+                        yield from _rlem_literal_words(literal, flag)
+                        literal = []
+
+    if group is not None:
+        pending.append(group)
+
+    # rest groups, runs cropped by body end, last three words to tail
+    body = data_len - 3
+    index = data_len - pending_len - (group[1] if group else 0)
+    tail = []
+    for word, count in pending:
+        if index < body:
+            if count > 1:
+                yield from _rlem_literal_words(literal, flag)
+                yield from _rlem_run_words(word, min(index + count, body) - index, flag)
+                literal = []
+            else:
+                literal.append(word)
+        tail += [word] * (index + count - max(index, body, 0))
+        index += count
+
+    yield from _rlem_literal_words(literal, flag)
+
+    # tail literal block written always, also empty
+    yield flag | len(tail)
+    yield from tail
+
+# ------------------------------------------------------------------------------
+# _rlem_run_words
+# ------------------------------------------------------------------------------
+def _rlem_run_words(word, count, flag):
+    """ run blocks words, run split by flag - 1 words """
+    while count > 0:
+        yield min(count, flag - 1)
+        yield word
+        count -= flag - 1
+
+# ------------------------------------------------------------------------------
+# _rlem_literal_words
+# ------------------------------------------------------------------------------
+def _rlem_literal_words(literal, flag):
+    """ literal blocks words, literal split by flag - 1 words """
+    for index in range(0, len(literal), flag - 1):
+        part = literal[index:index + flag - 1]
+        yield flag | len(part)
+        yield from part
+
+# ------------------------------------------------------------------------------
+# rlem_encode_reference
+# ------------------------------------------------------------------------------
+def rlem_encode_reference(data):
+    """ RLEm encode, reference word by word state machine """
     count = 1       # count words
     index = 0
-    start_index = 0    
+    start_index = 0
     out_list = []   # out RLEm compressed list
-    
+
+    data_len = len( data )
+    if data_len < 4:
+        return [ 0x8000 | data_len ] + [ word for word in data ]
+
     # init state
-    if data[0] != data[1]:                
+    if data[0] != data[1]:
         state = 'mismatch'
     else:
         state = 'match'
 
-    data_len = len( data )    
     for index in range( data_len - 3 ):
-        
+
         if state == 'match':
-            
+
             if data[ index ] == data[ index+1 ] and index < data_len - 4:
-                count += 1                
+                count += 1
             else:
                 out_list.append( count )
-                out_list.append( data[index] )                
-                
+                out_list.append( data[index] )
+
                 if data[ index+1 ] != data[ index+2 ]:
                     state = 'mismatch'
 
                 start_index = index + 1
-                count = 1         
+                count = 1
 
         elif state == 'mismatch':
-            
+
             odta = data[ start_index:index+1 ]
 
             if data[ index ] != data[ index+1 ] and index < data_len - 4:
-                
-                if data[ index+1 ] == data[ index+2 ]:                   
+
+                if data[ index+1 ] == data[ index+2 ]:
                     out_list.append( 0x8000 | count )
                     out_list += [ word for word in odta ]
                     state = 'match'
                     count = 1
                 else:
                     count += 1
-            else:                
-                if count > 1:                    
-                    out_list.append( 0x8000 | count )
-                    out_list += [ word for word in odta ]
-                
+            else:
+                # last body literal, also single word
+                out_list.append( 0x8000 | count )
+                out_list += [ word for word in odta ]
+
                 if data[index+1] == data[index+2]:
                     state = 'match'
                 start_index = index + 1
-                count = 1       
+                count = 1
+
+    out_list.append( 0x8000 | len(data[start_index:]) )
+    out_list += [ word for word in data[start_index:] ]
 
-    out_list.append( 0x8000 | len(data[start_index:]) )       
-    out_list += [ word for word in data[start_index:] ] 
-    
     return out_list
 
 # ------------------------------------------------------------------------------
 # rlem_decode
-# ------------------------------------------------------------------------------ 
-def rlem_decode(data):
-    out_list = []   # out decompressed list
+# ------------------------------------------------------------------------------
+def rlem_decode(data, width=16):
+    """ RLEm decode words stream, return array of decoded words ('H' for
+        16-bit words), runs are extended by array repetition and literals
+        by slices """
+    flag = _rlem_flag(width)
+    typecode = RLEM_TYPECODES[width]
+    words = data if isinstance(data, array) else array(typecode, data)
+    out = array(typecode)    # out decompressed array
 
-    data_len = len( data )
+    data_len = len( words )
     index = 0
 
-    while index < data_len - 3:
-        # print(index, data[index])
-        word = int( data[index] )
-        
-        if word & 0x8000:
-            cnt = word & ~0x8000
-            for w in range(cnt):
-                index += 1
-                out_list.append( data[index] )
-            index += 1
+    while index < data_len:
+        word = words[index]
+
+        if word & flag:
+            cnt = word & (flag - 1)
+            out.extend( words[index+1:index+1+cnt] )
+            index += cnt + 1
         else:
-            cnt = word
-            for w in range(cnt):                
-                out_list.append( data[index+1] )
+            out.extend( words[index+1:index+2] * word )
             index += 2
-    
-    if type(out_list[1]) == type(str):
-        out_list = ''.join( out_list )
 
-    return out_list
\ No newline at end of file
+    return out
+
+# ------------------------------------------------------------------------------
+# rlem_decode_rect
+# ------------------------------------------------------------------------------
+def rlem_decode_rect(data, offsets, band_rows, row_words, x, y, w, h, width=16):
+    """ decode rectangle from RLEm data encoded by rlem_encode_bands,
+        only bands with rectangle rows are decoded.
+        offsets - bands start offsets, band_rows - rows in each band,
+        row_words - words in each row, x, y, w, h - rectangle in words and
+        data rows (rows order is the same as in data).
+        Return array of rectangle words, row by row.
+    """
+    typecode = RLEM_TYPECODES[width]
+    words = data if isinstance(data, array) else array(typecode, data)
+    out = array(typecode)
+
+    if w <= 0 or h <= 0:
+        return out
+
+    first = y // band_rows
+    last = (y + h - 1) // band_rows
+
+    # decode needed bands, data end is the end of last band
+    end = offsets[last + 1] if last + 1 < len(offsets) else len(words)
+    rows = rlem_decode(words[offsets[first]:end], width)
+
+    for row in range(y - first * band_rows, y - first * band_rows + h):
+        out.extend(rows[row * row_words + x:row * row_words + x + w])
+
+    return out
+
+# ------------------------------------------------------------------------------
+# verify_roundtrip
+# ------------------------------------------------------------------------------
+def verify_roundtrip(pixels, encoded=None, width=16):
+    """ check RLEm encoded data decodes back to source pixels, pixels are
+        encoded with rlem_encode if encoded data not gived """
+    if encoded is None:
+        encoded = rlem_encode(pixels, width=width)
+
+    decoded = rlem_decode(encoded, width)
+    decoded = np.frombuffer(decoded, dtype='u%d' % decoded.itemsize)
+    return np.array_equal(decoded, np.asarray(pixels).ravel())
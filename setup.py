@@ -25,6 +25,7 @@ nglfed - ui ngl font editor util
                                 'ngl_utils.nfont': ['qtres/*.ui'],
                                 'ngl_utils.nplugins.python': ['ico/*.ico'] },
     packages                = find_packages(),
+    install_requires        = [ 'numpy' ],
 
     entry_points  = { 'console_scripts':
          [ 'ngluic = ngl_utils.ngluic : main',
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+QtGui = pytest.importorskip('PyQt5.QtGui')
+
+from ngl_utils.nbitmap.atlas import NAtlas
+
+
+def check_places(sizes, places, atlas_sizes, width, height):
+    """ each image inside own atlas, atlas not larger than limits, no
+        overlapped images in atlas """
+    assert len(places) == len(sizes)
+
+    for index, (aw, ah) in enumerate(atlas_sizes):
+        assert aw <= width and ah <= height
+        used = np.zeros((ah, aw), dtype=np.int64)
+
+        for (w, h), (i, x, y) in zip(sizes, places):
+            if i == index:
+                assert x >= 0 and y >= 0 and x + w <= aw and y + h <= ah
+                used[y:y + h, x:x + w] += 1
+
+        assert used.max() <= 1
+
+    # no empty atlases
+    assert sorted(set(i for i, _, _ in places)) == list(range(len(atlas_sizes)))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_pack(seed):
+    rng = np.random.default_rng(seed)
+    sizes = [ (int(w), int(h)) for w, h in rng.integers(1, 33, (int(rng.integers(1, 60)), 2)) ]
+
+    places, atlas_sizes = NAtlas.pack(sizes, 64, 64)
+    check_places(sizes, places, atlas_sizes, 64, 64)
+
+
+def test_pack_one_atlas():
+    # equal squares fill atlas exactly
+    sizes = [(16, 16)] * 16
+    places, atlas_sizes = NAtlas.pack(sizes, 64, 64)
+
+    assert atlas_sizes == [(64, 64)]
+    check_places(sizes, places, atlas_sizes, 64, 64)
+
+
+def test_pack_new_atlas():
+    sizes = [(40, 40)] * 3
+    places, atlas_sizes = NAtlas.pack(sizes, 64, 64)
+
+    assert atlas_sizes == [(40, 40)] * 3
+    check_places(sizes, places, atlas_sizes, 64, 64)
+
+
+def image(w, h, color):
+    img = QtGui.QImage(w, h, QtGui.QImage.Format_ARGB32)
+    img.fill(color)
+    return img
+
+
+def test_build():
+    # images larger than atlas get own atlas, pixels copied to places
+    colors = [0xFF102030, 0x80405060, 0xFF708090, 0x00000000]
+    images = [ image(10, 12, colors[0]), image(100, 20, colors[1]),
+               image(30, 30, colors[2]), image(5, 5, colors[3]) ]
+
+    atlases, places = NAtlas.build(images, 32, 32)
+    assert len(places) == len(images)
+
+    for img, color, (index, x, y) in zip(images, colors, places):
+        atlas = atlases[index]
+        assert x + img.width() <= atlas.width() and y + img.height() <= atlas.height()
+        assert atlas.pixel(x, y) == color
+        assert atlas.pixel(x + img.width() - 1, y + img.height() - 1) == color
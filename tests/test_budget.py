@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+import itertools
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PyQt5.QtGui')
+
+from ngl_utils.nbitmap.budget import NFlashBudget
+
+
+def candidate(size, sse):
+    return { 'codec': 'JPG', 'quality': 50, 'bytes': size, 'sse': sse }
+
+
+def convex_candidates(rng, count):
+    """ candidates with 10 bytes steps and decreasing sse gains, with
+        dominated candidates of the same bytes and larger sse """
+    gains = np.sort(rng.integers(1, 1000, count - 1))[::-1]
+    sse = np.concatenate([[gains.sum()], gains.sum() - np.cumsum(gains)])
+    candidates = [ candidate(100 + 10 * i, int(e)) for i, e in enumerate(sse) ]
+
+    for i in rng.integers(0, count, 3):
+        candidates.append(candidate(100 + 10 * int(i), int(sse[i]) + int(rng.integers(1, 50))))
+
+    order = rng.permutation(len(candidates))
+    return [ candidates[i] for i in order ]
+
+
+def brute_force(candidates, budget):
+    """ minimum total sse of all choices within budget """
+    best = None
+    for choice in itertools.product(*candidates):
+        if sum(c['bytes'] for c in choice) <= budget:
+            sse = sum(c['sse'] for c in choice)
+            best = sse if best is None else min(best, sse)
+    return best
+
+
+def test_hull():
+    points = [ (100, 1000), (150, 900), (200, 500), (200, 600), (300, 400),
+               (250, 700), (400, 100), (500, 100), (90, 2000) ]
+    candidates = [ candidate(b, e) for b, e in points ]
+
+    hull = NFlashBudget._hull(candidates)
+    assert [ points[i] for i in hull ] == [ (90, 2000), (100, 1000), (200, 500), (400, 100) ]
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_hull_random(seed):
+    rng = np.random.default_rng(seed)
+    candidates = [ candidate(int(b), int(e)) for b, e in rng.integers(1, 1000, (30, 2)) ]
+    hull = [ (candidates[i]['bytes'], candidates[i]['sse']) for i in NFlashBudget._hull(candidates) ]
+
+    # bytes increase, sse decrease, slopes flatten
+    assert all(b0 < b1 and e0 > e1 for (b0, e0), (b1, e1) in zip(hull, hull[1:]))
+    slopes = [ (e0 - e1) / float(b1 - b0) for (b0, e0), (b1, e1) in zip(hull, hull[1:]) ]
+    assert all(s0 >= s1 for s0, s1 in zip(slopes, slopes[1:]))
+
+    # no candidate below hull
+    for c in candidates:
+        b, e = c['bytes'], c['sse']
+        assert b >= hull[0][0]
+        for (b0, e0), (b1, e1) in zip(hull, hull[1:]):
+            if b0 <= b <= b1:
+                assert e * (b1 - b0) >= e0 * (b1 - b) + e1 * (b - b0)
+        if b >= hull[-1][0]:
+            assert e >= hull[-1][1]
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_allocate_optimal(seed):
+    rng = np.random.default_rng(seed)
+    candidates = [ convex_candidates(rng, int(rng.integers(1, 5))) for _ in range(3) ]
+    smallest = sum(min(c['bytes'] for c in cands) for cands in candidates)
+    largest = sum(max(c['bytes'] for c in cands) for cands in candidates)
+
+    for budget in range(smallest, largest + 20, 10):
+        chosen = NFlashBudget.allocate(candidates, budget)
+        total = sum(cands[i]['bytes'] for cands, i in zip(candidates, chosen))
+        sse = sum(cands[i]['sse'] for cands, i in zip(candidates, chosen))
+
+        assert total <= budget
+        assert sse == brute_force(candidates, budget)
+
+
+def test_allocate_limits():
+    rng = np.random.default_rng(1)
+    candidates = [ [ candidate(int(b), int(e)) for b, e in rng.integers(1, 1000, (8, 2)) ]
+                   for _ in range(5) ]
+    smallest = sum(min(c['bytes'] for c in cands) for cands in candidates)
+
+    assert NFlashBudget.allocate(candidates, smallest - 1) is None
+
+    for budget in (smallest, smallest + 100, smallest + 1000, 10 ** 6):
+        chosen = NFlashBudget.allocate(candidates, budget)
+        assert sum(cands[i]['bytes'] for cands, i in zip(candidates, chosen)) <= budget
+
+    # large budget, minimum sse of each bitmap
+    chosen = NFlashBudget.allocate(candidates, 10 ** 6)
+    assert [ cands[i]['sse'] for cands, i in zip(candidates, chosen) ] == \
+           [ min(c['sse'] for c in cands) for cands in candidates ]
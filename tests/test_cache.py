@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import os
+import pickle
+
+from ngl_utils.nbitmap.ncache import NBitmapsCache
+from ngl_utils.nbitmap.nbitmap import NGL_Bitmap
+
+params = (('RLE', 100), 0, False, 'format16', 0, 'flash', None, 'none', 'le')
+
+
+def bitmap(name, words=1000):
+    b = NGL_Bitmap(name, 10, 10, 'RLE')
+    b.data_word_size, b.color_bit, b.datatype = 16, 16, 'uint16_t'
+    b.data = list(range(words))
+    return b
+
+
+def image_file(tmp_path, name, data=b'png'):
+    path = str(tmp_path / name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def test_hit_miss(tmp_path):
+    cache = NBitmapsCache(str(tmp_path / 'cache'))
+    key = cache.key(image_file(tmp_path, 'bg.png'), params)
+
+    assert cache.get(key) is None
+
+    cache.put(key, bitmap('bg'))
+    cached = cache.get(key)
+    assert cached.name == 'bg'
+    assert list(cached.data) == list(range(1000))
+
+
+def test_key(tmp_path, monkeypatch):
+    cache = NBitmapsCache(str(tmp_path / 'cache'))
+    path = image_file(tmp_path, 'bg.png')
+    key = cache.key(path, params)
+
+    assert cache.key(path, params) == key
+    assert cache.key(path, (('None', 100),) + params[1:]) != key
+    assert cache.key(image_file(tmp_path, 'icon.png'), params) != key
+    assert cache.key(image_file(tmp_path, 'bg.png', b'png2'), params) != key
+
+    # converter code changed
+    path = image_file(tmp_path, 'bg.png')
+    monkeypatch.setattr(NBitmapsCache, '_code_hash', 'other')
+    assert cache.key(path, params) != key
+
+
+def test_broken_files(tmp_path):
+    cache = NBitmapsCache(str(tmp_path / 'cache'))
+    os.makedirs(cache.path)
+
+    contents = { 'empty': b'',
+                 'garbage': b'\x80\x05not a pickle',
+                 'truncated': pickle.dumps(bitmap('bg'))[:50],
+                 'other': pickle.dumps({ 'name': 'bg' }),
+                 'class': pickle.dumps(bitmap('bg')).replace(b'NGL_Bitmap', b'NGL_Bitmaq') }
+
+    for key, data in contents.items():
+        with open(cache._file(key), 'wb') as f:
+            f.write(data)
+        assert cache.get(key) is None
+
+    # broken file replaced by put
+    cache.put('garbage', bitmap('bg'))
+    assert cache.get('garbage').name == 'bg'
+
+
+def test_evict(tmp_path):
+    cache = NBitmapsCache(str(tmp_path / 'cache'))
+    cache.put('a', bitmap('a'))
+    size = os.path.getsize(cache._file('a'))
+    cache.max_size = size * 2 + size // 2
+
+    cache.put('b', bitmap('b'))
+    os.utime(cache._file('a'), (1, 1))
+    os.utime(cache._file('b'), (2, 2))
+
+    # hit marks 'a' as recently used, 'b' removed
+    assert cache.get('a') is not None
+    cache.put('c', bitmap('c'))
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
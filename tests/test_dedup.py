@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+QtGui = pytest.importorskip('PyQt5.QtGui')
+
+from ngl_utils.ngluic import NUIC
+
+
+def image(pixels):
+    """ ARGB32 QImage from (height, width) numpy ARGB array """
+    height, width = pixels.shape
+    img = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+    for y in range(height):
+        for x in range(width):
+            img.setPixel(x, y, int(pixels[y, x]))
+    return img
+
+
+def save(tmp_path, name, pixels, fmt='PNG'):
+    path = str(tmp_path / name)
+    assert image(pixels).save(path, fmt)
+    return path
+
+
+def dedup(bitmaps, files=False, anims=None):
+    return NUIC.dedupBitmaps(None, bitmaps, files, anims)
+
+
+@pytest.fixture
+def pixels():
+    rng = np.random.default_rng(1)
+    return (0xFF000000 | rng.integers(0, 1 << 24, (4, 6))).astype(np.uint32)
+
+
+def test_same_pixels(tmp_path, pixels):
+    # the same pixels in other file format are merged with objects
+    first = save(tmp_path, 'a.png', pixels)
+    copy = save(tmp_path, 'b.bmp', pixels, 'BMP')
+    other = save(tmp_path, 'c.png', pixels ^ 1)
+
+    unique, duplicates = dedup({ first: ['obj1'], copy: ['obj2', 'obj3'], other: ['obj4'] })
+    assert unique == { first: ['obj1', 'obj2', 'obj3'], other: ['obj4'] }
+    assert duplicates == { first: [copy] }
+
+
+def test_size(tmp_path, pixels):
+    # the same data words in other size are not merged
+    first = save(tmp_path, 'a.png', pixels)
+    other = save(tmp_path, 'b.png', pixels.reshape(6, 4))
+
+    unique, duplicates = dedup({ first: ['obj1'], other: ['obj2'] })
+    assert sorted(unique) == sorted([first, other])
+    assert duplicates == {}
+
+
+def test_files(tmp_path, pixels):
+    # files compared by bytes, other file format is not merged
+    first = save(tmp_path, 'a.png', pixels)
+    copy = save(tmp_path, 'b.png', pixels)
+    other = save(tmp_path, 'c.bmp', pixels, 'BMP')
+
+    unique, duplicates = dedup({ first: ['obj1'], copy: ['obj2'], other: ['obj3'] }, files=True)
+    assert unique == { first: ['obj1', 'obj2'], other: ['obj3'] }
+    assert duplicates == { first: [copy] }
+
+
+def test_anims(tmp_path, pixels):
+    # animations compared by all frames and delays, not by first frame file
+    frames = [ image(pixels), image(pixels ^ 1) ]
+    paths = [ save(tmp_path, '%s.png' % name, pixels) for name in 'abcd' ]
+    anims = { paths[0]: (frames, [100, 100]),
+              paths[1]: (list(frames), [100, 100]),
+              paths[2]: (frames, [100, 50]),
+              paths[3]: (frames[:1], [100]) }
+
+    unique, duplicates = dedup(dict((path, [i]) for i, path in enumerate(paths)), anims=anims)
+    assert unique == { paths[0]: [0, 1], paths[2]: [2], paths[3]: [3] }
+    assert duplicates == { paths[0]: [paths[1]] }
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from ngl_utils.nbitmap.dither import NDither
+
+
+def fs_reference(values, levels):
+    """ Floyd-Steinberg error diffusion pixel by pixel, rows left to right,
+        errors out of image dropped """
+    values = np.array(values, dtype=np.float64)
+    height, width = values.shape[:2]
+    step = 255.0 / (np.asarray(levels, dtype=np.float64) - 1)
+    out = np.empty(values.shape, dtype=np.uint8)
+
+    for y in range(height):
+        for x in range(width):
+            index = np.clip(np.rint(values[y, x] / step), 0, np.asarray(levels) - 1)
+            out[y, x] = index
+            error = values[y, x] - index * step
+
+            for dx, dy, part in ((1, 0, 7), (-1, 1, 3), (0, 1, 5), (1, 1, 1)):
+                if 0 <= x + dx < width and y + dy < height:
+                    values[y + dy, x + dx] += error * part / 16.0
+
+    return out
+
+
+@pytest.mark.parametrize('levels', [2, 4, 16])
+@pytest.mark.parametrize('shape', [(1, 1), (1, 9), (9, 1), (7, 13), (16, 5)])
+def test_fs_reference(levels, shape):
+    # levels steps are integers, errors sums exact in any order
+    rng = np.random.default_rng(levels * 100 + shape[0])
+    values = rng.integers(0, 256, shape)
+
+    assert NDither.floydSteinberg(values, levels).tolist() == fs_reference(values, levels).tolist()
+
+
+def test_fs_reference_channels():
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 256, (11, 8, 3))
+    levels = (4, 16, 2)
+
+    assert NDither.floydSteinberg(values, levels).tolist() == fs_reference(values, levels).tolist()
+
+
+@pytest.mark.parametrize('method', NDither.methods)
+def test_flat_mean(method):
+    # flat gray of any level keeps mean level, no dithering - nearest
+    for value in (0, 30, 100, 128, 200, 255):
+        index = NDither.quantize(np.full((32, 32), value), 2, method)
+        assert set(np.unique(index).tolist()) <= {0, 1}
+
+        if method == 'none':
+            assert np.all(index == round(value / 255.0))
+        else:
+            assert abs(index.mean() - value / 255.0) < 0.02
+
+
+def test_ordered_levels():
+    # ramp is monotonic in each row, extremes are exact
+    values = np.tile(np.arange(256), (8, 1))
+    index = NDither.ordered(values, 4)
+
+    assert index[:, 0].tolist() == [0] * 8
+    assert index[:, -1].tolist() == [3] * 8
+    assert np.all(np.abs(index - values * 3 / 255.0) < 1)
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        NDither.quantize(np.zeros((2, 2)), 2, 'random')
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+from array import array
+
+import numpy as np
+import pytest
+
+from ngl_utils.lzss import lzss_encode, lzss_decode
+from ngl_utils.nbitmap.ncodecs import NBitmapCodecs, NLZSSCodec
+from ngl_utils.rle import RLEM_TYPECODES
+
+
+def roundtrip(data, window_bits=8, lookahead_bits=4):
+    encoded = lzss_encode(data, window_bits, lookahead_bits)
+    assert bytes(lzss_decode(encoded, window_bits, lookahead_bits)) == bytes(data)
+    return encoded
+
+
+def test_empty():
+    assert roundtrip(b'') == b''
+
+
+@pytest.mark.parametrize('data', [b'a', b'ab', b'aa', b'aaa', b'abab', b'\x00\xff'])
+def test_short(data):
+    roundtrip(data)
+
+
+def test_matches_longer_than_lookahead():
+    # 1000 equal bytes, copies not longer than 16 bytes
+    data = b'x' + b'\x55' * 1000 + b'y'
+    encoded = roundtrip(data)
+    assert len(encoded) < 1000 // 16 * 2 + 8
+
+
+def test_overlapping_copies():
+    # copies longer than offset back, pattern repeated from itself
+    for period in (1, 2, 3, 5, 7):
+        data = bytes(range(period)) * 50
+        encoded = roundtrip(data)
+        assert len(encoded) < len(data) // 2
+
+
+def test_window():
+    # repeat further than window is not matched, near repeat is matched
+    rng = np.random.default_rng(1)
+    block = rng.integers(0, 256, 300, dtype=np.uint8).tobytes()
+    far = roundtrip(block + block)
+    near = roundtrip(block[:200] + block[:200])
+    assert len(far) > len(block) * 2
+    assert len(near) < 200 * 9 // 8 + 200 // 16 * 2 + 4
+
+
+@pytest.mark.parametrize('window_bits, lookahead_bits', [(8, 4), (5, 3), (10, 5), (6, 2)])
+def test_random(window_bits, lookahead_bits):
+    rng = np.random.default_rng(window_bits * 16 + lookahead_bits)
+
+    for size in (3, 17, 100, 5000):
+        for values in (2, 16, 256):
+            data = np.repeat(rng.integers(0, values, size),
+                             rng.integers(1, 6, size))[:size].astype(np.uint8)
+            roundtrip(data.tobytes(), window_bits, lookahead_bits)
+
+
+@pytest.mark.parametrize('width', [8, 16, 32])
+def test_codec_words_width(width):
+    rng = np.random.default_rng(width)
+    words = np.repeat(rng.integers(0, 5, 3000), rng.integers(1, 8, 3000))[:3000]
+    pixels = array(RLEM_TYPECODES[width], (words * (2 ** (width - 4) - 3)).tolist())
+
+    data = NLZSSCodec.encode(None, pixels, width)
+    assert NLZSSCodec.decode(data, width) == pixels
+
+
+def test_not_in_auto():
+    assert NLZSSCodec not in NBitmapCodecs.select('AUTO')
+    assert NLZSSCodec in NBitmapCodecs.select('auto+lzss')
+    assert NBitmapCodecs.select('LZSS') == [NLZSSCodec]
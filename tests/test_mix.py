@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+QtGui = pytest.importorskip('PyQt5.QtGui')
+
+from ngl_utils.nbitmap.converter import NBitmapsConverter
+from ngl_utils.nplugins.widgets.ngl_colors import NGL_Colors
+
+
+@pytest.mark.parametrize('backcolor', [0x0000, 0xFFFF, 0x0010, 0xF81F, 0x4A69])
+def test_mix_as_qpainter(backcolor):
+    # all alfa values with colors channels steps
+    alfa = np.arange(0, 256, 5)
+    levels = np.array([0, 1, 37, 128, 200, 254, 255])
+    alfa, r, g, b = [ v.ravel() for v in np.meshgrid(alfa, levels, levels[::2], levels[1::2]) ]
+    argb = (alfa << 24) | (r << 16) | (g << 8) | b
+
+    mixed = NBitmapsConverter.mixPixels(argb, backcolor)
+
+    img = QtGui.QImage(1, 1, QtGui.QImage.Format_ARGB32)
+    painter = QtGui.QPainter()
+    back = QtGui.QColor(*NGL_Colors.getRGB(backcolor))
+    for pixel, out in zip(argb.tolist(), mixed.tolist()):
+        ref = NBitmapsConverter.mixColors(img, back, QtGui.QColor.fromRgba(pixel), painter)
+
+        for shift in (16, 8, 0):
+            assert abs(((ref >> shift) & 0xFF) - ((out >> shift) & 0xFF)) <= 1
+
+
+def test_mix_opaque_and_transparent():
+    argb = np.array([0xFF123456, 0x00123456], dtype=np.uint32)
+    back = 0xF81F
+
+    for gamma in (None, 2.2):
+        mixed = NBitmapsConverter.mixPixels(argb, back, gamma)
+        r, g, b = NGL_Colors.getRGB(back)
+        assert mixed[0] == 0xFF123456
+        assert mixed[1] == 0xFF000000 | (r << 16) | (g << 8) | b
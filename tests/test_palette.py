@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+
+from ngl_utils.nbitmap.palette import NPalette
+
+
+def random_colors(rng, size, values=256):
+    return rng.integers(0, values, (size, 3)).astype(np.uint8)
+
+
+@pytest.mark.parametrize('count', [2, 4, 16, 256])
+def test_palette_size(count):
+    rng = np.random.default_rng(count)
+    colors = random_colors(rng, 5000)
+
+    indexes, palette = NPalette.quantize(colors, count)
+    assert len(palette) == count
+    assert len(indexes) == len(colors)
+    assert indexes.max() < count
+
+    # each color is mapped to nearest palette color
+    assert indexes.tolist() == NPalette.nearest(colors, palette).tolist()
+
+
+def test_few_colors():
+    # palette is exactly unique colors, no colors changed
+    rng = np.random.default_rng(1)
+    unique = random_colors(rng, 5)
+    colors = unique[rng.integers(0, 5, 1000)]
+
+    indexes, palette = NPalette.quantize(colors, 16)
+    assert len(palette) == len(np.unique(unique, axis=0))
+    assert palette[indexes].tolist() == colors.tolist()
+
+
+def test_dominant_color():
+    # color of most pixels is own box, kept exactly
+    colors = np.array([[0, 0, 0]] * 100 + [[255, 255, 255]] * 3 + [[10, 200, 30]])
+
+    indexes, palette = NPalette.quantize(colors, 2)
+    assert len(palette) == 2
+    assert palette[indexes[:100]].tolist() == [[0, 0, 0]] * 100
+
+
+@pytest.mark.parametrize('bpp', NPalette.bits)
+def test_pack(bpp):
+    rng = np.random.default_rng(bpp)
+    width = 13
+    indexes = rng.integers(0, 1 << bpp, (5, width))
+
+    packed = NPalette.pack(indexes, bpp)
+    row_bytes = -(-width * bpp // 8)
+    assert len(packed) == 5 * row_bytes
+
+    # unpack MSB first pixels, rows byte aligned
+    bits = np.unpackbits(packed.reshape(5, row_bytes), axis=1)[:, :width * bpp]
+    weights = 1 << np.arange(bpp - 1, -1, -1)
+    assert (bits.reshape(5, width, bpp) @ weights).tolist() == indexes.tolist()
+
+
+def test_bits_for():
+    assert [ NPalette.bitsFor(n) for n in (1, 2, 3, 4, 5, 16, 17, 256, 300) ] == \
+           [1, 1, 2, 2, 4, 4, 8, 8, 8]
+
+
+def test_rgb():
+    colors = NPalette.fromRGB888([0x123456, 0xFFFFFF, 0])
+    assert colors.tolist() == [[0x12, 0x34, 0x56], [255, 255, 255], [0, 0, 0]]
+    assert NPalette.toRGB565(colors) == [0x11AA, 0xFFFF, 0]
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from ngl_utils.nbitmap.respack import NResourcePack
+
+
+def build(tmp_path, names, align=4, base=0x90000000):
+    pack = NResourcePack(align, base)
+    for i, name in enumerate(names):
+        pack.add(name, bytes([i + 1]) * (i * 7 + 3))
+
+    path = str(tmp_path / 'res.bin')
+    pack.write(path)
+    return pack, path
+
+
+def test_read(tmp_path):
+    names = ['bg', 'icon1', 'icon2']
+    pack, path = build(tmp_path, names, align=16)
+
+    entries = NResourcePack.read(path)
+    assert [ name for name, _, _ in entries ] == names
+    assert [ payload for _, _, payload in entries ] == [ p for _, p in pack.entries ]
+    assert [ offset for _, offset, _ in entries ] == pack.offsets()
+    assert all(offset % 16 == 0 for offset in pack.offsets())
+    assert pack.addresses() == [ 0x90000000 + offset for offset in pack.offsets() ]
+
+
+def test_addresses_verify(tmp_path):
+    names = ['a', 'b', 'c']
+    pack, path = build(tmp_path, names)
+    addresses = dict(zip(names, pack.addresses()))
+
+    assert pack.verify(path, addresses) == []
+
+    # stale address of entry added before others
+    addresses['a'] = 0x90000000 + NResourcePack.header.size + NResourcePack.entry.size
+    assert pack.verify(path, addresses) == ['a']
+
+
+@pytest.mark.parametrize('length', [22, 23, 24, 25, 40])
+def test_long_names(tmp_path, length):
+    names = [ ('bitmap_settings_icon_pressed_large' * 2)[:length], 'x' ]
+    pack, path = build(tmp_path, names)
+
+    # names stored with zero terminator
+    stored = [ name for name, _, _ in NResourcePack.read(path) ]
+    assert stored[0] == names[0][:NResourcePack.name_size - 1]
+    assert pack.verify(path, dict(zip(names, pack.addresses()))) == []
+
+
+def test_same_stored_names():
+    pack = NResourcePack()
+    pack.add('bitmap_settings_icon_pressed_large', b'1')
+
+    with pytest.raises(ValueError):
+        pack.add('bitmap_settings_icon_pressed_small', b'2')
+
+
+def test_align():
+    with pytest.raises(ValueError):
+        NResourcePack(align=3)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import itertools
+
+import numpy as np
+import pytest
+
+from ngl_utils.rle import ( rlem_encode, rlem_encode_reference, rlem_encode_stream,
+                            rlem_encode_bands, rlem_decode, rlem_decode_rect, verify_roundtrip,
+                            _rlem_groups, _rlem_optimal_blocks, _rlem_split )
+
+
+def random_words(rng, size, runs, values=4):
+    """ random 16-bit words, 'runs' - maximum equal words run length """
+    values = rng.integers(0, values, size)
+    lens = rng.integers(1, runs + 1, size)
+    return np.repeat(values, lens)[:size].astype(np.uint16)
+
+
+@pytest.mark.parametrize('size', [0, 1, 2, 3, 4, 5, 8, 17, 100, 1000])
+@pytest.mark.parametrize('runs', [1, 2, 3, 8])
+def test_random_words(size, runs):
+    rng = np.random.default_rng(size * 10 + runs)
+
+    for _ in range(20):
+        words = random_words(rng, size, runs)
+
+        encoded = rlem_encode(words)
+        assert encoded == rlem_encode_reference(words.tolist())
+        assert verify_roundtrip(words, encoded)
+
+
+def test_long_runs():
+    words = np.concatenate([ np.full(5000, 0x1234), np.arange(10), np.full(20000, 7),
+                             [1, 1, 2] ]).astype(np.uint16)
+
+    encoded = rlem_encode(words)
+    assert encoded == rlem_encode_reference(words.tolist())
+    assert verify_roundtrip(words, encoded)
+
+
+def test_runs_longer_than_count():
+    # blocks longer than 0x7FFF words are split, reference does not split
+    words = np.concatenate([ np.full(100000, 5), np.arange(70000) ]).astype(np.uint16)
+
+    for optimal in (False, True):
+        assert verify_roundtrip(words, rlem_encode(words, optimal))
+
+
+@pytest.mark.parametrize('width', [8, 16, 32])
+def test_optimal_not_larger(width):
+    rng = np.random.default_rng(width)
+
+    # long literals of many values, longer than 8-bit blocks
+    for values, runs in ((4, 4), (200, 2), (200, 5)):
+        for size in (100, 400, 5000):
+            words = random_words(rng, size, runs, values)
+
+            optimal = rlem_encode(words, optimal=True, width=width)
+            assert len(optimal) <= len(rlem_encode(words, width=width))
+            assert rlem_decode(optimal, width).tolist() == words.tolist()
+
+
+def optimal_size(words, max_count):
+    """ encoded words count of optimal blocks split by max_count """
+    _, lens, runs = _rlem_split(*_rlem_optimal_blocks(words, max_count), max_count)
+    return int(np.where(runs, 2, lens + 1).sum())
+
+
+def brute_force_size(words, max_count):
+    """ minimum encoded words count of all groups to run or literal choices """
+    starts, ends = _rlem_groups(words)
+    counts = (ends + 1 - starts).tolist()
+    sizes = []
+
+    for choice in itertools.product((False, True), repeat=len(counts)):
+        size, literal = 0, 0
+        for count, run in zip(counts, choice):
+            if run:
+                size += 2 * -(-count // max_count)
+                size += literal + -(-literal // max_count)
+                literal = 0
+            else:
+                literal += count
+        sizes.append(size + literal + -(-literal // max_count))
+
+    return min(sizes)
+
+
+@pytest.mark.parametrize('max_count', [2, 3, 4, 5])
+def test_optimal_brute_force(max_count):
+    rng = np.random.default_rng(max_count)
+
+    for _ in range(300):
+        words = random_words(rng, int(rng.integers(1, 25)), 4, 3)
+        if len(_rlem_groups(words)[0]) > 12:
+            continue
+        assert optimal_size(words, max_count) == brute_force_size(words, max_count)
+
+
+@pytest.mark.parametrize('width', [8, 32])
+def test_words_width(width):
+    rng = np.random.default_rng(width)
+    words = random_words(rng, 3000, 5).astype(np.uint32) * (2 ** (width - 8) - 1)
+
+    encoded = rlem_encode(words, width=width)
+    assert rlem_decode(encoded, width).tolist() == words.tolist()
+
+
+def test_image(tmp_path):
+    QtGui = pytest.importorskip('PyQt5.QtGui')
+    from ngl_utils.nbitmap.converter import NBitmapsConverter
+
+    # gradient, flat areas and antialiased shapes, saved and loaded as PNG
+    image = QtGui.QImage(120, 80, QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor(0, 0, 64))
+    painter = QtGui.QPainter(image)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    gradient = QtGui.QLinearGradient(0, 0, 120, 0)
+    gradient.setColorAt(0, QtGui.QColor(255, 0, 0))
+    gradient.setColorAt(1, QtGui.QColor(0, 0, 255))
+    painter.fillRect(0, 0, 120, 20, QtGui.QBrush(gradient))
+    painter.setBrush(QtGui.QColor(255, 255, 0, 128))
+    painter.drawEllipse(20, 25, 60, 50)
+    painter.end()
+
+    path = str(tmp_path / 'image.png')
+    assert image.save(path)
+
+    pixels = NBitmapsConverter.imagePixels(QtGui.QImage(path), 0).ravel()
+
+    encoded = rlem_encode(pixels)
+    assert encoded == rlem_encode_reference(pixels.tolist())
+    assert verify_roundtrip(pixels, encoded)
+
+
+@pytest.mark.parametrize('width', [8, 16, 32])
+def test_stream(width):
+    rng = np.random.default_rng(width + 1)
+
+    # noise with literals longer than blocks, runs and short data
+    for size, runs, values in ((0, 1, 4), (3, 2, 4), (7, 3, 4), (5000, 4, 4),
+                               (5000, 1, 1000), (70000, 1, 60000), (7, 10000, 3)):
+        words = random_words(rng, size, runs, values)
+        if runs > size:
+            # runs longer than blocks
+            words = np.repeat(words, runs)
+            size = len(words)
+        cuts = np.sort(rng.integers(0, size + 1, int(rng.integers(0, 20))))
+        chunks = np.split(words, cuts)
+
+        assert list(rlem_encode_stream(chunks, width)) == rlem_encode(words, width=width)
+
+
+def test_stream_literal_bounded():
+    # noise literal blocks encoded while chunks are read
+    rng = np.random.default_rng(2)
+    read = []
+
+    def chunks():
+        for i in range(100):
+            read.append(i)
+            yield rng.integers(0, 200, 1000) * 2 + np.arange(1000) % 2
+
+    stream = rlem_encode_stream(chunks(), 8)
+    for _ in range(128 * 10):
+        next(stream)
+    assert len(read) < 20
+
+
+@pytest.mark.parametrize('width', [8, 16, 32])
+def test_bands(width):
+    rng = np.random.default_rng(width + 2)
+    row_words, rows, band_rows = 37, 23, 4
+    words = random_words(rng, row_words * rows, 6)
+
+    data, offsets = rlem_encode_bands(words, band_rows * row_words, width=width)
+    assert len(offsets) == -(-rows // band_rows)
+    assert rlem_decode(data, width).tolist() == words.tolist()
+
+    # each band is independent stream
+    band_words = band_rows * row_words
+    for band, (start, end) in enumerate(zip(offsets, offsets[1:] + [len(data)])):
+        assert rlem_decode(data[start:end], width).tolist() == \
+               words[band * band_words:(band + 1) * band_words].tolist()
+
+
+@pytest.mark.parametrize('width', [8, 16, 32])
+@pytest.mark.parametrize('band_rows', [1, 3, 8, 30])
+def test_decode_rect(width, band_rows):
+    rng = np.random.default_rng(width * 100 + band_rows)
+    row_words, rows = 29, 23
+    words = random_words(rng, row_words * rows, 5)
+    image = words.reshape(rows, row_words)
+
+    data, offsets = rlem_encode_bands(words, band_rows * row_words, width=width)
+
+    # random rects, also bands borders, last rows and whole image
+    rects = [ (0, 0, row_words, rows), (0, rows - 1, row_words, 1), (5, 0, 0, 3) ]
+    for _ in range(50):
+        x, y = int(rng.integers(0, row_words)), int(rng.integers(0, rows))
+        rects.append((x, y, int(rng.integers(1, row_words - x + 1)),
+                      int(rng.integers(1, rows - y + 1))))
+
+    for x, y, w, h in rects:
+        rect = rlem_decode_rect(data, offsets, band_rows, row_words, x, y, w, h, width)
+        assert rect.tolist() == image[y:y + h, x:x + w].ravel().tolist()